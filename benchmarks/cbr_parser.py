@@ -0,0 +1,100 @@
+"""
+Compares the previous CBR XML parser (decode to text, build the full tree,
+find() per field) with exchange.parse_cbr_xml (a pull parser fed the bytes).
+
+Usage:
+    python benchmarks/cbr_parser.py recorded/*.xml
+    python benchmarks/cbr_parser.py --synthetic 500
+
+Reports documents per second, MB per second and peak traced memory.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+from xml.etree import ElementTree
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from exchange import parse_cbr_xml  # noqa: E402
+
+
+def parse_tree_legacy(content: bytes) -> dict:
+    """
+    The parser fetch_cbr_rates used before: response.text with the encoding
+    forced to utf-8, ElementTree.fromstring and find() per field.
+    """
+    root = ElementTree.fromstring(content.decode("utf-8", errors="replace"))
+    rates = {}
+    for valute in root.findall('Valute'):
+        code = valute.find('CharCode').text
+        nominal = float(valute.find('Nominal').text.replace(',', '.'))
+        value = float(valute.find('Value').text.replace(',', '.'))
+        rates[f"{code}_RUB"] = value / nominal
+    return rates
+
+
+def synthetic_document(currencies: int) -> bytes:
+    """
+    Builds a windows-1251 document shaped like XML_daily.asp.
+    """
+    valutes = []
+    for i in range(currencies):
+        code = "".join(chr(65 + (i // 26 ** k) % 26) for k in range(3))
+        valutes.append(
+            f'<Valute ID="R{i:05d}"><NumCode>{i:03d}</NumCode><CharCode>{code}</CharCode>'
+            f'<Nominal>{random.choice((1, 10, 100))}</Nominal><Name>Валюта {code}</Name>'
+            f'<Value>{random.uniform(0.1, 200):.4f}'.replace(".", ",") + '</Value></Valute>'
+        )
+    return (
+        '<?xml version="1.0" encoding="windows-1251"?>'
+        '<ValCurs Date="04.02.2025" name="Foreign Currency Market">' + "".join(valutes) + '</ValCurs>'
+    ).encode("cp1251")
+
+
+def measure(parser, documents: list, rounds: int) -> tuple:
+    total_bytes = sum(len(doc) for doc in documents) * rounds
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for doc in documents:
+            parser(doc)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    for doc in documents:
+        parser(doc)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    docs = len(documents) * rounds
+    return docs / elapsed, total_bytes / elapsed / 1e6, peak
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("files", nargs="*", help="Recorded XML_daily.asp responses")
+    arg_parser.add_argument("--synthetic", type=int, default=0,
+                            help="Add N synthetic documents (used when no files are given)")
+    arg_parser.add_argument("--currencies", type=int, default=55, help="Currencies per synthetic document")
+    arg_parser.add_argument("--rounds", type=int, default=20)
+    args = arg_parser.parse_args()
+
+    documents = []
+    for path in args.files:
+        with open(path, "rb") as f:
+            documents.append(f.read())
+    synthetic = args.synthetic or (0 if documents else 200)
+    documents += [synthetic_document(args.currencies) for _ in range(synthetic)]
+
+    print(f"{len(documents)} documents, {sum(map(len, documents)) / 1e3:.1f} KB, {args.rounds} rounds")
+    print(f"{'parser':<12}{'docs/s':>12}{'MB/s':>10}{'peak KB':>12}")
+    for name, parser in (("tree", parse_tree_legacy), ("pull", parse_cbr_xml)):
+        docs_per_sec, mb_per_sec, peak = measure(parser, documents, args.rounds)
+        print(f"{name:<12}{docs_per_sec:>12.0f}{mb_per_sec:>10.2f}{peak / 1e3:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Replays the same conversations of many users through each runtime of
+runtime.build_updater ("sequential", "threads" and "asyncio") against a
+fake Bot API with a fixed round-trip time, and compares updates per
+second. Each user's replies must come out identical and in the same order
+under all of them.
+
+Usage:
+    python benchmarks/runtime_throughput.py
+    python benchmarks/runtime_throughput.py --users 200 --latency 0.05 --threads 16
+
+Needs config.py (BOT_TOKEN is not used) and the rates file, like the bot.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from queue import Queue
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.chdir(sys.path[0])
+
+from telegram import Update  # noqa: E402
+from telegram.ext import Dispatcher, ExtBot, JobQueue  # noqa: E402
+from telegram.utils.request import Request  # noqa: E402
+
+from config import ADMIN_CHAT_ID  # noqa: E402
+from main import add_handlers  # noqa: E402
+from runtime import DISPATCHERS, connection_pool_size, runtime_stats  # noqa: E402
+
+# One user's session: every flow through to the admin message, with typos
+CONVERSATION = (
+    "/start", "импортер", "Germny", "CB::country:DE", "XYZ", "Others", "CB::curpage:1", "CB::cur:EUR", "6000",
+    "да", "123", "goods", "+1234567890", "yes",
+    "exporter", "China", "EUR", "5", "yes", "s", "r", "+1234567", "yes",
+    "физ", "transfer to self", "UAE", "AED", "100000", "yes", "+1234567", "yes",
+    "agent", "2", "Italy", "USD", "100", "yes", "s", "r", "+1234567", "no",
+    "/help", "/menu",
+)
+
+
+class FakeApiRequest(Request):
+    """
+    Answers every Bot API call after latency seconds, at most con_pool_size
+    at a time like the real connection pool, and records the sent texts.
+    """
+    __slots__ = ("latency", "slots", "sent", "methods")
+
+    def __init__(self, con_pool_size: int, latency: float):
+        super().__init__(con_pool_size=con_pool_size)
+        self.latency = latency
+        self.slots = threading.BoundedSemaphore(con_pool_size)
+        self.sent = defaultdict(list)
+        self.methods = []
+
+    def post(self, url, data=None, timeout=None):
+        method = url.rsplit("/", 1)[1]
+        data = data or {}
+        with self.slots:
+            time.sleep(self.latency)
+        self.methods.append(method)
+        chat_id = data.get("chat_id")
+        if chat_id is not None:
+            self.sent[chat_id].append((method, data.get("text")))
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+        if method in ("sendMessage", "editMessageText", "editMessageReplyMarkup"):
+            return {"message_id": 1, "date": 0, "chat": {"id": chat_id or 0, "type": "private"},
+                    "text": data.get("text", "")}
+        return True
+
+
+def workload(users: int) -> list:
+    """
+    The users' updates interleaved as they would arrive: everyone's first
+    input, then everyone's second, and so on.
+    """
+    updates = []
+    for step, text in enumerate(CONVERSATION):
+        for user_id in range(1000, 1000 + users):
+            update_id = step * users + user_id
+            sender = {"id": user_id, "is_bot": False, "first_name": "U", "username": f"user{user_id}"}
+            chat = {"id": user_id, "type": "private"}
+            if text.startswith("CB::"):
+                updates.append({"update_id": update_id, "callback_query": {
+                    "id": str(update_id), "data": text[4:], "chat_instance": "x", "from": sender,
+                    "message": {"message_id": 7, "date": 0, "text": "t", "chat": chat}}})
+                continue
+            entities = [{"type": "bot_command", "offset": 0, "length": len(text)}] if text.startswith("/") else []
+            updates.append({"update_id": update_id, "message": {
+                "message_id": update_id, "date": 0, "text": text, "entities": entities, "chat": chat, "from": sender}})
+    return updates
+
+
+def run(runtime: str, updates: list, threads: int, latency: float) -> tuple:
+    request = FakeApiRequest(connection_pool_size(threads), latency)
+    bot = ExtBot("123:abc", request=request)
+    job_queue = JobQueue()
+    if runtime in DISPATCHERS:
+        dispatcher = DISPATCHERS[runtime](bot, Queue(), job_queue=job_queue, handler_threads=threads)
+    else:
+        dispatcher = Dispatcher(bot, Queue(), job_queue=job_queue)
+    job_queue.set_dispatcher(dispatcher)
+    add_handlers(dispatcher)
+
+    parsed = [Update.de_json(json.loads(json.dumps(update)), bot) for update in updates]
+    ready = threading.Event()
+    thread = threading.Thread(target=dispatcher.start, kwargs={"ready": ready})
+    thread.start()
+    ready.wait()
+
+    started = time.perf_counter()
+    for update in parsed:
+        dispatcher.update_queue.put(update)
+    # Deepest backlog seen while the workload drains
+    deepest = 0
+    while dispatcher.update_queue.unfinished_tasks:
+        stats = runtime_stats(dispatcher)
+        deepest = max(deepest, stats.longest)
+        time.sleep(0.01)
+    dispatcher.update_queue.join()
+    elapsed = time.perf_counter() - started
+
+    dispatcher.stop()
+    thread.join()
+    return elapsed, len(request.methods), deepest, dict(request.sent)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--users", type=int, default=100)
+    arg_parser.add_argument("--latency", type=float, default=0.02, help="Seconds per Bot API call")
+    arg_parser.add_argument("--threads", type=int, default=16, help="Handler threads of the concurrent runtimes")
+    args = arg_parser.parse_args()
+
+    updates = workload(args.users)
+    print(f"{args.users} users, {len(updates)} updates, {args.latency * 1000:.0f} ms per API call")
+    print(f"{'runtime':<12}{'seconds':>10}{'updates/s':>12}{'API calls':>12}{'chat queue':>12}")
+    results = {}
+    for runtime in ("sequential", "threads", "asyncio"):
+        elapsed, calls, deepest, sent = run(runtime, updates, args.threads, args.latency)
+        # Requests from different users reach the admin chat in any order
+        sent[ADMIN_CHAT_ID] = sorted(sent.get(ADMIN_CHAT_ID, []))
+        results[runtime] = sent
+        print(f"{runtime:<12}{elapsed:>10.2f}{len(updates) / elapsed:>12.1f}{calls:>12}{deepest:>12}")
+
+    expected = results.pop("sequential")
+    for runtime, sent in results.items():
+        if sent != expected:
+            differ = [chat for chat in expected if expected[chat] != sent.get(chat)]
+            raise SystemExit(f"{runtime}: replies differ for {len(differ)} chats, e.g. {differ[:5]}")
+    print("Replies identical and in order for every chat")
+
+
+if __name__ == "__main__":
+    main()
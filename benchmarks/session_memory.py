@@ -0,0 +1,142 @@
+"""
+Compares the memory held by user_data for many users in the middle of a
+flow: the previous layout (one "<flow>_<field>" key per answer, amounts as
+typed text, a fresh string per code) against the current one (the language
+plus one records.FlowRecord under records.FLOW_KEY).
+
+Usage:
+    python benchmarks/session_memory.py
+    python benchmarks/session_memory.py --users 100000 --seed 1
+
+Reports traced bytes per session and in total for both layouts, and the
+estimate the session sweeper works with (sessions.estimate_size).
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from records import (  # noqa: E402
+    FLOW_KEY,
+    AgentExporterRecord,
+    AgentImporterRecord,
+    ExporterRecord,
+    ImporterRecord,
+    PhysicalRecord,
+    country_code,
+    currency_code
+)
+from sessions import estimate_size  # noqa: E402
+
+FLOWS = {
+    "importer": ImporterRecord,
+    "exporter": ExporterRecord,
+    "physical": PhysicalRecord,
+    "agent_importer": AgentImporterRecord,
+    "agent_exporter": AgentExporterRecord,
+}
+COUNTRIES = ("CN", "AE", "TR", "KZ", "IN", "HK", "UZ", "KG", "AM")
+CURRENCIES = ("USD", "EUR", "CNY", "AED", "TRY", "KZT", "INR", "HKD")
+CHOICES = ("physical_choice_self", "physical_choice_relative", "physical_choice_services")
+
+
+def fresh(text: str) -> str:
+    """
+    A new string object, as a decoded update gives for every reply.
+    """
+    return "".join(list(text))
+
+
+def answers(rng: random.Random) -> tuple:
+    """
+    One user's flow and what they have answered so far: every flow step
+    up to a random point, filled with plausible values.
+    """
+    flow = rng.choice(tuple(FLOWS))
+    values = {
+        "country": rng.choice(COUNTRIES),
+        "currency": rng.choice(CURRENCIES),
+        "amount": str(rng.randrange(6000, 500000, 50)),
+    }
+    if flow == "physical":
+        values = {"choice": rng.choice(CHOICES), **values, "phone": f"+7999{rng.randrange(10 ** 7):07d}"}
+    elif flow.endswith("importer"):
+        values.update(commission_percent=rng.choice((0.0, 1.0, 2.0)), commission_message=None,
+                      inn=f"{rng.randrange(10 ** 10):010d}", purpose="Оплата по контракту поставки оборудования",
+                      phone=f"+7999{rng.randrange(10 ** 7):07d}")
+    else:
+        values.update(sender_details="ООО Ромашка, Москва, ул. Ленина 1",
+                      receiver_details="Shenzhen Trading Co., Ltd, Shenzhen",
+                      phone=f"+7999{rng.randrange(10 ** 7):07d}")
+    answered = rng.randint(1, len(values))
+    return flow, dict(list(values.items())[:answered]), rng.randrange(10 ** 9), f"user{rng.randrange(10 ** 6)}"
+
+
+def legacy_session(flow: str, values: dict, user_id: int, username: str) -> dict:
+    """
+    user_data as the step handlers used to fill it.
+    """
+    data = {"lang": "ru"}
+    if flow == "physical":
+        data["physical_choice"] = values.pop("choice", None)
+    elif flow.startswith("agent"):
+        data["agent_choice"] = fresh("make_payment" if flow == "agent_importer" else "forex_rebate")
+    for field, value in values.items():
+        data[f"{flow}_{field}"] = fresh(value) if isinstance(value, str) else value
+        if field == "currency":
+            data[f"{flow}_currency_manual"] = False
+    data[f"{flow}_user_id"] = user_id
+    data[f"{flow}_username"] = fresh(username)
+    return data
+
+
+def record_session(flow: str, values: dict, user_id: int, username: str) -> dict:
+    """
+    user_data as the flows fill it now.
+    """
+    record = FLOWS[flow](user_id=user_id, username=fresh(username))
+    for field, value in values.items():
+        if field == "country":
+            value = country_code(fresh(value))
+        elif field == "currency":
+            value = currency_code(fresh(value))
+        elif field == "amount":
+            value = float(value)
+        elif isinstance(value, str):
+            value = fresh(value)
+        setattr(record, field, value)
+    return {"lang": "ru", FLOW_KEY: record}
+
+
+def measure(build, users: list) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    sessions = {user[2]: build(*user[:1], dict(user[1]), *user[2:]) for user in users}
+    traced, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    estimated = sum(estimate_size(data) for data in sessions.values())
+    return traced, estimated
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--users", type=int, default=100000)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(args.seed)
+    users = [answers(rng) for _ in range(args.users)]
+
+    print(f"{args.users} sessions in the middle of a flow")
+    print(f"{'layout':<10}{'traced MB':>12}{'B/session':>12}{'estimated MB':>15}")
+    for name, build in (("dict", legacy_session), ("record", record_session)):
+        traced, estimated = measure(build, users)
+        print(f"{name:<10}{traced / 1e6:>12.1f}{traced / args.users:>12.0f}{estimated / 1e6:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
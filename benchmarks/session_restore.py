@@ -0,0 +1,112 @@
+"""
+Measures persistence.SQLitePersistence with many stored sessions: the
+batched write of every session, the restore at startup and the cost the
+dispatcher pays per update. PTB's PicklePersistence (one pickle file,
+written per update or on flush) is measured alongside.
+
+Usage:
+    python benchmarks/session_restore.py
+    python benchmarks/session_restore.py --users 100000 --updates 20
+
+The databases are created in a temporary directory and removed afterwards.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from telegram.ext import PicklePersistence  # noqa: E402
+
+from persistence import SQLitePersistence  # noqa: E402
+from session_memory import answers, record_session  # noqa: E402
+
+CONVERSATION = "main"
+
+
+def populate(persistence, sessions: dict, states: dict) -> float:
+    """
+    Hands every session to the persistence as the dispatcher would and
+    flushes; returns the seconds taken.
+    """
+    # As the dispatcher does first; PicklePersistence only writes what it loaded
+    restore(persistence)
+    started = time.perf_counter()
+    for user_id, data in sessions.items():
+        persistence.update_user_data(user_id, data)
+        persistence.update_conversation(CONVERSATION, (user_id, user_id), states[user_id])
+    persistence.flush()
+    return time.perf_counter() - started
+
+
+def restore(persistence) -> tuple:
+    started = time.perf_counter()
+    user_data = persistence.get_user_data()
+    persistence.get_chat_data()
+    conversations = persistence.get_conversations(CONVERSATION)
+    return time.perf_counter() - started, len(user_data), len(conversations)
+
+
+def per_update(persistence, sessions: dict, states: dict, updates: int) -> float:
+    """
+    Average seconds of the persistence calls after one handled update that
+    changed the user's data and conversation state.
+    """
+    user_ids = random.sample(list(sessions), updates)
+    started = time.perf_counter()
+    for user_id in user_ids:
+        data = sessions[user_id]
+        data["lang"] = "en" if data["lang"] == "ru" else "ru"
+        persistence.update_user_data(user_id, data)
+        persistence.update_chat_data(user_id, {})
+        persistence.update_conversation(CONVERSATION, (user_id, user_id), states[user_id])
+    return (time.perf_counter() - started) / updates
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--users", type=int, default=100000)
+    arg_parser.add_argument("--updates", type=int, default=20,
+                            help="Updates timed per backend (PicklePersistence rewrites its file on each)")
+    arg_parser.add_argument("--seed", type=int, default=0)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(args.seed)
+    sessions, states = {}, {}
+    for _ in range(args.users):
+        flow, values, user_id, username = answers(rng)
+        sessions[user_id] = record_session(flow, values, user_id, username)
+        states[user_id] = f"{flow}.{list(values)[-1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = (
+            ("sqlite", lambda: SQLitePersistence(os.path.join(tmp, "sessions.db")), "sessions.db"),
+            ("pickle", lambda: PicklePersistence(os.path.join(tmp, "sessions.pickle"), store_bot_data=False,
+                                                 on_flush=True), "sessions.pickle"),
+            ("pickle/upd", lambda: PicklePersistence(os.path.join(tmp, "sessions.pickle"), store_bot_data=False),
+             None),
+        )
+        print(f"{len(sessions)} sessions")
+        print(f"{'backend':<12}{'write s':>10}{'size MB':>10}{'restore s':>12}{'per update us':>16}")
+        for name, create, filename in backends:
+            persistence = create()
+            written = populate(persistence, sessions, states) if filename else float("nan")
+            size = float("nan")
+            if filename:
+                # Until SQLite checkpoints, the rows are in the write-ahead log
+                paths = [os.path.join(tmp, filename), os.path.join(tmp, f"{filename}-wal")]
+                size = sum(os.path.getsize(path) for path in paths if os.path.exists(path)) / 1e6
+
+            restored = create()
+            restore_time, users, conversations = restore(restored)
+            if users != len(sessions) or conversations != len(sessions):
+                raise SystemExit(f"{name} restored {users} sessions, {conversations} conversations")
+            update_time = per_update(restored, restored.get_user_data(), states, args.updates)
+            print(f"{name:<12}{written:>10.2f}{size:>10.1f}{restore_time:>12.2f}{update_time * 1e6:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+from collections import namedtuple
+
+from telegram import Update
+from telegram.ext import CallbackContext, ConversationHandler, Filters, Handler, TypeHandler
+
+from config import ADMIN_CHAT_ID
+from countries import COUNTRIES, country_label, country_name, lookup_countries, search_countries
+from currency_search import lookup_currencies, search_currencies
+from handlers import (
+    admin_message,
+    calculate_commission,
+    get_available_currencies,
+    get_user_lang,
+    go_back_to_main_menu,
+    is_valid_number,
+    is_valid_phone,
+    preview_text,
+    yes_no_keyboard
+)
+from i18n import translate as _
+from intents import INTENT_PHRASES, YES_NO, match_intent
+from keyboards import (
+    COUNTRY_CALLBACK,
+    CURRENCY_CALLBACK,
+    CURRENCY_PAGE_CALLBACK,
+    REMOVE_KEYBOARD,
+    country_choice_keyboard,
+    currency_choice_keyboard,
+    get_keyboard
+)
+from rates import get_snapshot
+from records import FLOW_KEY, country_code, currency_code, format_amount
+from replies import send_reply
+from sessions import clear_flow_data, conversation_timed_out
+
+# Replies a step interprets; commands go to the ConversationHandler fallbacks
+TEXT_MESSAGES = Filters.update.message & Filters.text & ~Filters.command
+
+# state id -> Step or Menu, flow name -> Flow
+_nodes = {}
+
+
+class StepHandler(Handler):
+    """
+    The single handler of a conversation state: text replies and the step's
+    own inline buttons both go to step.handle.
+    """
+    __slots__ = ("step",)
+
+    def __init__(self, step):
+        super().__init__(step.handle)
+        self.step = step
+
+    def check_update(self, update: object):
+        if not isinstance(update, Update):
+            return None
+        if update.callback_query is not None:
+            prefix = self.step.callback_prefix
+            data = update.callback_query.data
+            return bool(prefix and data and data.startswith(prefix))
+        return TEXT_MESSAGES(update)
+
+
+#
+# -------------------------------------------------------------------
+# Steps
+# -------------------------------------------------------------------
+#
+
+class Step:
+    """
+    One state of a flow. Entering the step sends its prompt; replies are
+    validated, stored in the flow's record (see records.py) as the step's
+    field and move on to the next step of the flow.
+
+    prompt is a text key, or a callable (record, lang) -> text. keyboard is
+    a registered keyboard id; without one, the previous step's keyboard is
+    removed. Steps with intents get the reply as one of them (or None) in
+    on_intent instead of on_text.
+    """
+    __slots__ = ("field", "prompt", "keyboard", "flow", "state", "next", "remove_keyboard")
+    callback_prefix = None
+    intents = None
+
+    def __init__(self, field: str, prompt=None, keyboard: str = None):
+        self.field = field
+        self.prompt = prompt
+        self.keyboard = keyboard
+        self.flow = self.state = self.next = None
+        self.remove_keyboard = False
+
+    def bind(self, flow, previous, next_step) -> None:
+        self.flow = flow
+        self.state = f"{flow.name}.{self.field}"
+        self.next = next_step
+        self.remove_keyboard = previous is not None and previous.keyboard is not None
+
+    def enter(self, update: Update, context: CallbackContext, lang: str, record):
+        if callable(self.prompt):
+            text = self.prompt(record, lang)
+        else:
+            text = _(self.prompt, lang)
+        if self.keyboard:
+            markup = get_keyboard(self.keyboard, lang)
+        else:
+            markup = REMOVE_KEYBOARD if self.remove_keyboard else None
+        update.effective_message.reply_text(text, reply_markup=markup)
+        return self.state
+
+    def handle(self, update: Update, context: CallbackContext):
+        """
+        The generic step handler: the conversation state selects the step,
+        the step interprets the update against the flow's record.
+        """
+        record = context.user_data.get(FLOW_KEY)
+        if type(record) is not self.flow.record:
+            # The session was evicted while the conversation stayed open
+            if update.callback_query is not None:
+                update.callback_query.answer()
+            return go_back_to_main_menu(update, context)
+
+        lang = get_user_lang(context)
+        if update.callback_query is not None:
+            return self.on_callback(update, context, lang, record, update.callback_query)
+        if self.intents is not None:
+            return self.on_intent(update, context, lang, record, match_intent(update.message.text, self.intents))
+        return self.on_text(update, context, lang, record, update.message.text.strip())
+
+    def on_text(self, update: Update, context: CallbackContext, lang: str, record, text: str):
+        raise NotImplementedError
+
+    def on_intent(self, update: Update, context: CallbackContext, lang: str, record, intent):
+        raise NotImplementedError
+
+    def on_callback(self, update: Update, context: CallbackContext, lang: str, record, query):
+        query.answer()
+        return self.state
+
+
+class TextStep(Step):
+    """
+    Free text, stored as typed.
+    """
+    __slots__ = ()
+
+    def on_text(self, update, context, lang, record, text):
+        setattr(record, self.field, text)
+        return self.next.enter(update, context, lang, record)
+
+
+class PhoneStep(Step):
+    __slots__ = ()
+
+    def __init__(self, field: str = "phone", prompt="enter_phone", keyboard: str = None):
+        super().__init__(field, prompt, keyboard)
+
+    def on_text(self, update, context, lang, record, text):
+        if not is_valid_phone(text):
+            update.message.reply_text(_("invalid_phone", lang))
+            return self.state
+        setattr(record, self.field, text)
+        return self.next.enter(update, context, lang, record)
+
+
+class AmountStep(Step):
+    """
+    Transfer amount in the record's currency, stored as a float. With
+    minimum set, it is checked against the precomputed minimum for that
+    category ("importer", "physical"); with commission, the importer
+    commission is stored as commission_percent and commission_message.
+    """
+    __slots__ = ("minimum", "commission")
+
+    def __init__(self, field: str = "amount", prompt="enter_transfer_amount", keyboard: str = None,
+                 minimum: str = None, commission: bool = False):
+        super().__init__(field, prompt, keyboard)
+        self.minimum = minimum
+        self.commission = commission
+
+    def on_text(self, update, context, lang, record, text):
+        if not is_valid_number(text):
+            update.message.reply_text(_("invalid_number", lang))
+            return self.state
+
+        amount = float(text)
+        if self.minimum:
+            currency = record.currency or "USD"
+
+            # All lookups below come from one precomputed snapshot
+            snapshot = get_snapshot()
+            minimum = snapshot.minimum(self.minimum, currency) if snapshot is not None else None
+            if minimum is None:
+                update.message.reply_text(_("rates_unavailable", lang))
+                return self.state
+
+            usd_amount = snapshot.to_usd(amount, currency)
+            if amount < minimum:
+                update.message.reply_text(_(f"minimum_{self.minimum}", lang, minimum=minimum, amount=amount,
+                                            currency=currency, usd_amount=usd_amount))
+                return self.state
+
+            if self.commission:
+                record.commission_percent, record.commission_message = calculate_commission(
+                    usd_amount, snapshot.get("USD_RUB")
+                )
+
+        setattr(record, self.field, amount)
+        return self.next.enter(update, context, lang, record)
+
+
+class ConfirmStep(Step):
+    """
+    Yes/no question: "yes" continues the flow, anything else returns to the
+    main menu. Nothing is stored.
+    """
+    __slots__ = ()
+    intents = YES_NO
+
+    def __init__(self, field: str, prompt, keyboard: str = "yes_no"):
+        super().__init__(field, prompt, keyboard)
+
+    def on_intent(self, update, context, lang, record, intent):
+        if intent == "yes":
+            return self.next.enter(update, context, lang, record)
+        return go_back_to_main_menu(update, context)
+
+
+class CountryStep(Step):
+    """
+    A country name, alias or ISO code in Russian or English, or a press on
+    one of the countries suggested for inexact input. The ISO code is stored.
+    """
+    __slots__ = ()
+    callback_prefix = COUNTRY_CALLBACK
+
+    def __init__(self, field: str = "country", prompt=None, keyboard: str = "countries"):
+        super().__init__(field, prompt, keyboard)
+
+    def on_text(self, update, context, lang, record, text):
+        matches = lookup_countries(text)
+        if len(matches) != 1:
+            # Prefix and typo matches ("Germny") are only offered, never taken as is
+            matches = matches or search_countries(text)
+            if not matches:
+                update.message.reply_text(_("invalid_country", lang), reply_markup=get_keyboard("countries", lang))
+                return self.state
+            update.message.reply_text(_("country_suggestions", lang),
+                                      reply_markup=country_choice_keyboard(matches, lang))
+            return self.state
+
+        setattr(record, self.field, country_code(matches[0]))
+        return self.next.enter(update, context, lang, record)
+
+    def on_callback(self, update, context, lang, record, query):
+        country = query.data[len(COUNTRY_CALLBACK):]
+        query.answer()
+        if country not in COUNTRIES:
+            return self.state
+
+        setattr(record, self.field, country_code(country))
+        query.edit_message_text(_("country_selected", lang, country=country_name(country, lang)))
+        return self.next.enter(update, context, lang, record)
+
+
+class CurrencyStep(Step):
+    """
+    A currency code or name, or "Others" to open the inline picker. Several
+    or inexact matches are offered as inline buttons. The code is stored.
+    """
+    __slots__ = ()
+    callback_prefix = "cur"
+
+    def __init__(self, field: str = "currency", prompt="select_currency", keyboard: str = "currency"):
+        super().__init__(field, prompt, keyboard)
+
+    def on_text(self, update, context, lang, record, text):
+        if text.upper() == "OTHERS":
+            update.message.reply_text(
+                _("currency_picker_prompt", lang),
+                reply_markup=get_keyboard("currency_pages", lang)[0]
+            )
+            return self.state
+
+        # Codes, names and aliases ("евро", "$", "kzt") are taken as is; prefix
+        # and typo matches ("дирхем", "rub") are only offered as buttons
+        matches = lookup_currencies(text)
+        if len(matches) != 1:
+            matches = matches or search_currencies(text)
+            if not matches:
+                update.message.reply_text(_("invalid_currency", lang))
+                return self.state
+            update.message.reply_text(_("currency_suggestions", lang), reply_markup=currency_choice_keyboard(matches))
+            return self.state
+
+        setattr(record, self.field, currency_code(matches[0]))
+        return self.next.enter(update, context, lang, record)
+
+    def on_callback(self, update, context, lang, record, query):
+        """
+        Turns to another pre-rendered page, or selects the currency carried
+        in the callback data.
+        """
+        data = query.data
+        if data.startswith(CURRENCY_PAGE_CALLBACK):
+            query.answer()
+            page = data[len(CURRENCY_PAGE_CALLBACK):]
+            pages = get_keyboard("currency_pages", lang)
+            if page.isdigit():
+                query.edit_message_reply_markup(reply_markup=pages[min(int(page), len(pages) - 1)])
+            return self.state
+
+        if not data.startswith(CURRENCY_CALLBACK):
+            # The page indicator button
+            query.answer()
+            return self.state
+
+        currency = data[len(CURRENCY_CALLBACK):]
+        if currency not in get_available_currencies():
+            query.answer(_("currency_unavailable", lang), show_alert=True)
+            return self.state
+
+        query.answer()
+        setattr(record, self.field, currency_code(currency))
+        query.edit_message_text(_("currency_selected", lang, currency=currency))
+        return self.next.enter(update, context, lang, record)
+
+
+# field -> (shown to the user in lang, shown to the admin)
+FIELD_FORMATS = {
+    "country": (country_name, lambda code: country_label(code, "ru")),
+    "amount": (lambda amount, lang: format_amount(amount), format_amount),
+    "choice": (lambda key, lang: _(key, lang) if key else key, lambda key: _(key, "ru") if key else key),
+}
+
+
+class PreviewStep(Step):
+    """
+    Last step of every flow: shows the collected fields with the
+    "preview_<flow>" text and, on "yes", sends them to the admin chat with
+    "admin_<flow>".
+    """
+    __slots__ = ("fields",)
+    intents = YES_NO
+
+    def __init__(self, fields: tuple, field: str = "preview"):
+        super().__init__(field)
+        self.fields = fields
+
+    def values(self, record, lang: str = None) -> dict:
+        values = {}
+        for field in self.fields:
+            value = getattr(record, field)
+            formats = FIELD_FORMATS.get(field)
+            if formats is not None:
+                value = formats[0](value, lang) if lang else formats[1](value)
+            values[field] = value
+        return values
+
+    def enter(self, update, context, lang, record):
+        user = update.effective_user
+        record.user_id = user.id
+        record.username = user.username
+
+        text = preview_text(f"preview_{self.flow.name}", lang, user.username, **self.values(record, lang))
+        update.effective_message.reply_text(text, reply_markup=yes_no_keyboard(lang))
+        return self.state
+
+    def on_intent(self, update, context, lang, record, intent):
+        if intent == "yes":
+            msg = admin_message(f"admin_{self.flow.name}", record.user_id, record.username, **self.values(record))
+            context.bot.send_message(chat_id=ADMIN_CHAT_ID, text=msg)
+            update.message.reply_text(_("data_sent", lang))
+        else:
+            update.message.reply_text(_("request_cancelled", lang))
+        return go_back_to_main_menu(update, context)
+
+
+#
+# -------------------------------------------------------------------
+# Flows & menus
+# -------------------------------------------------------------------
+#
+
+class Flow:
+    """
+    A named sequence of steps collecting one record type. Each step becomes
+    the conversation state "<name>.<field>" and fills the record's field of
+    the same name; the record is user_data[FLOW_KEY] while the flow runs.
+    """
+    __slots__ = ("name", "record", "steps")
+
+    def __init__(self, name: str, record: type, steps: tuple):
+        self.name = name
+        self.record = record
+        self.steps = steps
+        fields = record.fields()
+        for previous, step, next_step in zip((None,) + steps, steps, steps[1:] + (None,)):
+            step.bind(self, previous, next_step)
+            if step.state in _nodes:
+                raise ValueError(f"Duplicate conversation state {step.state}")
+            if not isinstance(step, (ConfirmStep, PreviewStep)) and step.field not in fields:
+                raise ValueError(f"{record.__name__} has no field for step {step.state}")
+            _nodes[step.state] = step
+        _nodes[name] = self
+
+    @property
+    def state(self):
+        return self.steps[0].state
+
+    def enter(self, update: Update, context: CallbackContext, lang: str, **values):
+        """
+        Starts the flow with a new record, pre-filled with values.
+        """
+        record = context.user_data[FLOW_KEY] = self.record(**values)
+        return self.steps[0].enter(update, context, lang, record)
+
+
+# intent: an id from intents.INTENT_PHRASES; target: a flow name or menu
+# state; data: record fields to pre-fill when the target is a flow
+Option = namedtuple("Option", ["intent", "target", "data"], defaults=(None,))
+
+
+class Menu:
+    """
+    A choice between flows and other menus. Replies matching no option show
+    fallback_text and stay, go to fallback, or repeat the menu. Entering a
+    menu with ends_flow drops the data of the flow the user was in.
+    """
+    __slots__ = ("state", "options", "intents", "prompt", "keyboard", "reply", "fallback", "fallback_text",
+                 "ends_flow")
+    callback_prefix = None
+
+    def __init__(self, state: str, options: tuple, prompt: str = None, keyboard: str = None,
+                 reply: str = None, fallback: str = None, fallback_text: str = None, ends_flow: bool = False):
+        self.state = state
+        self.options = {option.intent: option for option in options}
+        self.intents = frozenset(self.options)
+        self.prompt = prompt
+        self.keyboard = keyboard
+        self.reply = reply
+        self.fallback = fallback
+        self.fallback_text = fallback_text
+        self.ends_flow = ends_flow
+        if state in _nodes:
+            raise ValueError(f"Duplicate conversation state {state}")
+        _nodes[state] = self
+
+    def enter(self, update: Update, context: CallbackContext, lang: str):
+        if self.ends_flow:
+            clear_flow_data(context.user_data)
+        if self.reply:
+            send_reply(update.effective_message, self.reply, lang)
+        else:
+            update.effective_message.reply_text(_(self.prompt, lang), reply_markup=get_keyboard(self.keyboard, lang))
+        return self.state
+
+    def handle(self, update: Update, context: CallbackContext):
+        lang = get_user_lang(context)
+        option = self.options.get(match_intent(update.message.text, self.intents))
+        if option is None:
+            if self.fallback_text:
+                update.message.reply_text(_(self.fallback_text, lang))
+                return self.state
+            return _nodes[self.fallback or self.state].enter(update, context, lang)
+
+        if option.data:
+            return _nodes[option.target].enter(update, context, lang, **option.data)
+        return _nodes[option.target].enter(update, context, lang)
+
+
+def build_states() -> dict:
+    """
+    ConversationHandler states for every registered flow and menu: one
+    handler per state. A timed-out conversation drops its flow data.
+    """
+    states = {}
+    for node in _nodes.values():
+        if isinstance(node, Flow):
+            continue
+        if isinstance(node, Menu):
+            for option in node.options.values():
+                if option.intent not in INTENT_PHRASES:
+                    raise ValueError(f"Menu {node.state} has unknown intent {option.intent}")
+                if option.target not in _nodes:
+                    raise ValueError(f"Menu {node.state} leads to unknown flow or menu {option.target}")
+                if option.data and not isinstance(_nodes[option.target], Flow):
+                    raise ValueError(f"Menu {node.state} pre-fills data for menu {option.target}")
+        states[node.state] = [StepHandler(node)]
+    states[ConversationHandler.TIMEOUT] = [TypeHandler(Update, conversation_timed_out)]
+    return states
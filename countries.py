@@ -0,0 +1,310 @@
+from collections import namedtuple
+
+from textindex import SEARCH_LIMIT, TextIndex
+
+Country = namedtuple("Country", ["code", "en", "ru"])
+
+# ISO 3166-1 alpha-2 code | English name | Russian name | aliases (comma separated)
+_COUNTRY_TABLE = """
+AD|Andorra|Андорра|
+AE|United Arab Emirates|Объединённые Арабские Эмираты|UAE,Emirates,Dubai,Abu Dhabi,ОАЭ,Эмираты,Дубай,Абу-Даби
+AF|Afghanistan|Афганистан|
+AG|Antigua and Barbuda|Антигуа и Барбуда|Antigua
+AI|Anguilla|Ангилья|
+AL|Albania|Албания|
+AM|Armenia|Армения|
+AO|Angola|Ангола|
+AQ|Antarctica|Антарктида|
+AR|Argentina|Аргентина|
+AS|American Samoa|Американское Самоа|
+AT|Austria|Австрия|
+AU|Australia|Австралия|
+AW|Aruba|Аруба|
+AX|Åland Islands|Аландские острова|Aland
+AZ|Azerbaijan|Азербайджан|
+BA|Bosnia and Herzegovina|Босния и Герцеговина|Bosnia,Босния
+BB|Barbados|Барбадос|
+BD|Bangladesh|Бангладеш|
+BE|Belgium|Бельгия|
+BF|Burkina Faso|Буркина-Фасо|
+BG|Bulgaria|Болгария|
+BH|Bahrain|Бахрейн|
+BI|Burundi|Бурунди|
+BJ|Benin|Бенин|
+BL|Saint Barthélemy|Сен-Бартелеми|Saint Barthelemy
+BM|Bermuda|Бермудские острова|Бермуды
+BN|Brunei|Бруней|Brunei Darussalam
+BO|Bolivia|Боливия|
+BQ|Caribbean Netherlands|Бонэйр, Синт-Эстатиус и Саба|Bonaire
+BR|Brazil|Бразилия|
+BS|Bahamas|Багамские Острова|Багамы
+BT|Bhutan|Бутан|
+BV|Bouvet Island|Остров Буве|
+BW|Botswana|Ботсвана|
+BY|Belarus|Беларусь|Белоруссия,Belorussia
+BZ|Belize|Белиз|
+CA|Canada|Канада|
+CC|Cocos (Keeling) Islands|Кокосовые острова|Cocos Islands
+CD|DR Congo|ДР Конго|Democratic Republic of the Congo,Congo-Kinshasa,Демократическая Республика Конго
+CF|Central African Republic|Центральноафриканская Республика|CAR,ЦАР
+CG|Republic of the Congo|Республика Конго|Congo,Congo-Brazzaville,Конго
+CH|Switzerland|Швейцария|
+CI|Côte d'Ivoire|Кот-д'Ивуар|Ivory Coast,Cote d'Ivoire,Берег Слоновой Кости
+CK|Cook Islands|Острова Кука|
+CL|Chile|Чили|
+CM|Cameroon|Камерун|
+CN|China|Китай|PRC,КНР,Chinese,Китайская Народная Республика
+CO|Colombia|Колумбия|
+CR|Costa Rica|Коста-Рика|
+CU|Cuba|Куба|
+CV|Cabo Verde|Кабо-Верде|Cape Verde
+CW|Curaçao|Кюрасао|Curacao
+CX|Christmas Island|Остров Рождества|
+CY|Cyprus|Кипр|
+CZ|Czechia|Чехия|Czech Republic,Чешская Республика
+DE|Germany|Германия|Deutschland,ФРГ
+DJ|Djibouti|Джибути|
+DK|Denmark|Дания|
+DM|Dominica|Доминика|
+DO|Dominican Republic|Доминиканская Республика|Доминикана
+DZ|Algeria|Алжир|
+EC|Ecuador|Эквадор|
+EE|Estonia|Эстония|
+EG|Egypt|Египет|
+EH|Western Sahara|Западная Сахара|
+ER|Eritrea|Эритрея|
+ES|Spain|Испания|
+ET|Ethiopia|Эфиопия|
+FI|Finland|Финляндия|
+FJ|Fiji|Фиджи|
+FK|Falkland Islands|Фолклендские острова|
+FM|Micronesia|Микронезия|
+FO|Faroe Islands|Фарерские острова|
+FR|France|Франция|
+GA|Gabon|Габон|
+GB|United Kingdom|Великобритания|UK,Britain,Great Britain,England,Scotland,Англия,Британия,Соединённое Королевство,Шотландия
+GD|Grenada|Гренада|
+GE|Georgia|Грузия|Sakartvelo
+GF|French Guiana|Французская Гвиана|
+GG|Guernsey|Гернси|
+GH|Ghana|Гана|
+GI|Gibraltar|Гибралтар|
+GL|Greenland|Гренландия|
+GM|Gambia|Гамбия|
+GN|Guinea|Гвинея|
+GP|Guadeloupe|Гваделупа|
+GQ|Equatorial Guinea|Экваториальная Гвинея|
+GR|Greece|Греция|
+GS|South Georgia and the South Sandwich Islands|Южная Георгия и Южные Сандвичевы острова|
+GT|Guatemala|Гватемала|
+GU|Guam|Гуам|
+GW|Guinea-Bissau|Гвинея-Бисау|
+GY|Guyana|Гайана|
+HK|Hong Kong|Гонконг|Сянган
+HM|Heard Island and McDonald Islands|Остров Херд и острова Макдональд|
+HN|Honduras|Гондурас|
+HR|Croatia|Хорватия|
+HT|Haiti|Гаити|
+HU|Hungary|Венгрия|
+ID|Indonesia|Индонезия|Bali,Бали
+IE|Ireland|Ирландия|
+IL|Israel|Израиль|
+IM|Isle of Man|Остров Мэн|
+IN|India|Индия|
+IO|British Indian Ocean Territory|Британская территория в Индийском океане|
+IQ|Iraq|Ирак|
+IR|Iran|Иран|
+IS|Iceland|Исландия|
+IT|Italy|Италия|
+JE|Jersey|Джерси|
+JM|Jamaica|Ямайка|
+JO|Jordan|Иордания|
+JP|Japan|Япония|
+KE|Kenya|Кения|
+KG|Kyrgyzstan|Киргизия|Kyrgyz Republic,Kirghizia,Кыргызстан,Киргизстан
+KH|Cambodia|Камбоджа|
+KI|Kiribati|Кирибати|
+KM|Comoros|Коморы|Коморские Острова
+KN|Saint Kitts and Nevis|Сент-Китс и Невис|
+KP|North Korea|КНДР|DPRK,Северная Корея
+KR|South Korea|Южная Корея|Korea,Republic of Korea,Корея,Республика Корея
+KW|Kuwait|Кувейт|
+KY|Cayman Islands|Каймановы острова|
+KZ|Kazakhstan|Казахстан|Kazakstan
+LA|Laos|Лаос|
+LB|Lebanon|Ливан|
+LC|Saint Lucia|Сент-Люсия|
+LI|Liechtenstein|Лихтенштейн|
+LK|Sri Lanka|Шри-Ланка|Ceylon,Цейлон
+LR|Liberia|Либерия|
+LS|Lesotho|Лесото|
+LT|Lithuania|Литва|
+LU|Luxembourg|Люксембург|
+LV|Latvia|Латвия|
+LY|Libya|Ливия|
+MA|Morocco|Марокко|
+MC|Monaco|Монако|
+MD|Moldova|Молдова|Молдавия
+ME|Montenegro|Черногория|
+MF|Saint Martin|Сен-Мартен|
+MG|Madagascar|Мадагаскар|
+MH|Marshall Islands|Маршалловы Острова|
+MK|North Macedonia|Северная Македония|Macedonia,Македония
+ML|Mali|Мали|
+MM|Myanmar|Мьянма|Burma,Бирма
+MN|Mongolia|Монголия|
+MO|Macao|Макао|Macau,Аомынь
+MP|Northern Mariana Islands|Северные Марианские острова|
+MQ|Martinique|Мартиника|
+MR|Mauritania|Мавритания|
+MS|Montserrat|Монтсеррат|
+MT|Malta|Мальта|
+MU|Mauritius|Маврикий|
+MV|Maldives|Мальдивы|
+MW|Malawi|Малави|
+MX|Mexico|Мексика|
+MY|Malaysia|Малайзия|
+MZ|Mozambique|Мозамбик|
+NA|Namibia|Намибия|
+NC|New Caledonia|Новая Каледония|
+NE|Niger|Нигер|
+NF|Norfolk Island|Остров Норфолк|
+NG|Nigeria|Нигерия|
+NI|Nicaragua|Никарагуа|
+NL|Netherlands|Нидерланды|Holland,Голландия
+NO|Norway|Норвегия|
+NP|Nepal|Непал|
+NR|Nauru|Науру|
+NU|Niue|Ниуэ|
+NZ|New Zealand|Новая Зеландия|
+OM|Oman|Оман|
+PA|Panama|Панама|
+PE|Peru|Перу|
+PF|French Polynesia|Французская Полинезия|
+PG|Papua New Guinea|Папуа — Новая Гвинея|
+PH|Philippines|Филиппины|
+PK|Pakistan|Пакистан|
+PL|Poland|Польша|
+PM|Saint Pierre and Miquelon|Сен-Пьер и Микелон|
+PN|Pitcairn Islands|Острова Питкэрн|
+PR|Puerto Rico|Пуэрто-Рико|
+PS|Palestine|Палестина|
+PT|Portugal|Португалия|
+PW|Palau|Палау|
+PY|Paraguay|Парагвай|
+QA|Qatar|Катар|
+RE|Réunion|Реюньон|Reunion
+RO|Romania|Румыния|
+RS|Serbia|Сербия|
+RU|Russia|Россия|Russian Federation,РФ,Российская Федерация
+RW|Rwanda|Руанда|
+SA|Saudi Arabia|Саудовская Аравия|KSA
+SB|Solomon Islands|Соломоновы Острова|
+SC|Seychelles|Сейшельские Острова|Сейшелы
+SD|Sudan|Судан|
+SE|Sweden|Швеция|
+SG|Singapore|Сингапур|
+SH|Saint Helena|Остров Святой Елены|
+SI|Slovenia|Словения|
+SJ|Svalbard and Jan Mayen|Шпицберген и Ян-Майен|Svalbard,Шпицберген
+SK|Slovakia|Словакия|
+SL|Sierra Leone|Сьерра-Леоне|
+SM|San Marino|Сан-Марино|
+SN|Senegal|Сенегал|
+SO|Somalia|Сомали|
+SR|Suriname|Суринам|
+SS|South Sudan|Южный Судан|
+ST|São Tomé and Príncipe|Сан-Томе и Принсипи|Sao Tome and Principe
+SV|El Salvador|Сальвадор|
+SX|Sint Maarten|Синт-Мартен|
+SY|Syria|Сирия|
+SZ|Eswatini|Эсватини|Swaziland,Свазиленд
+TC|Turks and Caicos Islands|Теркс и Кайкос|
+TD|Chad|Чад|
+TF|French Southern Territories|Французские Южные и Антарктические территории|
+TG|Togo|Того|
+TH|Thailand|Таиланд|Тайланд,Siam
+TJ|Tajikistan|Таджикистан|
+TK|Tokelau|Токелау|
+TL|Timor-Leste|Восточный Тимор|East Timor
+TM|Turkmenistan|Туркменистан|Туркмения
+TN|Tunisia|Тунис|
+TO|Tonga|Тонга|
+TR|Türkiye|Турция|Turkey,Turkiye
+TT|Trinidad and Tobago|Тринидад и Тобаго|
+TV|Tuvalu|Тувалу|
+TW|Taiwan|Тайвань|
+TZ|Tanzania|Танзания|
+UA|Ukraine|Украина|
+UG|Uganda|Уганда|
+UM|United States Minor Outlying Islands|Внешние малые острова США|
+US|United States|США|USA,America,United States of America,Америка,Соединённые Штаты,Соединенные Штаты Америки
+UY|Uruguay|Уругвай|
+UZ|Uzbekistan|Узбекистан|
+VA|Vatican City|Ватикан|Holy See
+VC|Saint Vincent and the Grenadines|Сент-Винсент и Гренадины|
+VE|Venezuela|Венесуэла|
+VG|British Virgin Islands|Британские Виргинские острова|BVI
+VI|U.S. Virgin Islands|Виргинские Острова США|US Virgin Islands
+VN|Vietnam|Вьетнам|Viet Nam
+VU|Vanuatu|Вануату|
+WF|Wallis and Futuna|Уоллис и Футуна|
+WS|Samoa|Самоа|
+XK|Kosovo|Косово|
+YE|Yemen|Йемен|
+YT|Mayotte|Майотта|
+ZA|South Africa|ЮАР|Южно-Африканская Республика,Южная Африка,RSA
+ZM|Zambia|Замбия|
+ZW|Zimbabwe|Зимбабве|
+"""
+
+# Offered as buttons with every country prompt
+POPULAR_COUNTRIES = ("CN", "AE", "TR", "KZ", "IN", "HK", "UZ", "KG", "AM")
+
+
+def _parse_table(table: str) -> tuple[dict, dict]:
+    countries = {}
+    aliases = {}
+    for line in table.strip().splitlines():
+        code, en, ru, extra = line.split("|")
+        countries[code] = Country(code, en, ru)
+        aliases[code] = (code, en, ru, *(alias for alias in extra.split(",") if alias))
+    return countries, aliases
+
+
+COUNTRIES, _ALIASES = _parse_table(_COUNTRY_TABLE)
+COUNTRY_INDEX = TextIndex(_ALIASES)
+
+
+def search_countries(text: str, limit: int = SEARCH_LIMIT) -> tuple:
+    """
+    Resolves a typed country name, alias or code to ISO codes, best first.
+    """
+    return COUNTRY_INDEX.search(text, limit)
+
+
+def lookup_countries(text: str) -> tuple:
+    """
+    ISO codes whose name, alias or code is exactly text; no prefix or typo
+    matching.
+    """
+    return COUNTRY_INDEX.lookup(text)
+
+
+def country_name(code: str, lang: str) -> str:
+    """
+    The country's name in lang, or code itself if it is not a known country.
+    """
+    country = COUNTRIES.get(code)
+    if country is None:
+        return code
+    return country.en if lang == "en" else country.ru
+
+
+def country_label(code: str, lang: str) -> str:
+    """
+    "Китай (CN)": the name with its code, for admin notifications.
+    """
+    if code not in COUNTRIES:
+        return code
+    return f"{country_name(code, lang)} ({code})"
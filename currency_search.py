@@ -0,0 +1,128 @@
+import json
+import logging
+import threading
+
+from rates import DEFAULT_CURRENCIES, get_snapshot
+from textindex import SEARCH_LIMIT, TextIndex
+
+logger = logging.getLogger(__name__)
+
+# CODE -> CBR <Name>, written by exchange.py next to the rate files
+CURRENCY_NAMES_FILE = "exchange_currencies.json"
+
+# English and Russian names, common spellings and symbols, on top of the
+# ISO code and the CBR name. Only currencies present in the snapshot are
+# indexed. A term listed under several codes (e.g. ¥) returns all of them.
+CURRENCY_ALIASES = {
+    "USD": ("US dollar", "dollar", "dollars", "bucks", "$", "доллар", "доллары", "долларов", "доллар США", "бакс", "баксы"),
+    "EUR": ("euro", "euros", "€", "евро"),
+    "AED": ("UAE dirham", "dirham", "dirhams", "дирхам", "дирхамы", "дирхам ОАЭ"),
+    "CNY": ("yuan", "renminbi", "rmb", "chinese yuan", "¥", "юань", "юани", "китайский юань"),
+    "JPY": ("yen", "japanese yen", "¥", "иена", "йена", "японская иена"),
+    "GBP": ("pound", "pound sterling", "sterling", "£", "фунт", "фунт стерлингов"),
+    "CHF": ("swiss franc", "franc", "франк", "швейцарский франк"),
+    "KZT": ("tenge", "₸", "тенге", "казахстанский тенге"),
+    "TRY": ("lira", "turkish lira", "₺", "лира", "турецкая лира"),
+    "INR": ("rupee", "indian rupee", "₹", "рупия", "индийская рупия"),
+    "BYN": ("belarusian ruble", "белорусский рубль", "зайчик"),
+    "UZS": ("sum", "som", "uzbek sum", "сум", "узбекский сум"),
+    "KGS": ("kyrgyz som", "som", "сом", "киргизский сом"),
+    "TJS": ("somoni", "сомони"),
+    "AMD": ("dram", "֏", "драм", "армянский драм"),
+    "AZN": ("manat", "azerbaijani manat", "₼", "манат", "азербайджанский манат"),
+    "TMT": ("turkmen manat", "manat", "туркменский манат", "манат"),
+    "GEL": ("lari", "₾", "лари"),
+    "MDL": ("moldovan leu", "leu", "лей", "молдавский лей"),
+    "RON": ("romanian leu", "leu", "lei", "румынский лей"),
+    "UAH": ("hryvnia", "₴", "гривна", "гривны"),
+    "KRW": ("won", "south korean won", "₩", "вона", "корейская вона"),
+    "HKD": ("hong kong dollar", "гонконгский доллар"),
+    "SGD": ("singapore dollar", "сингапурский доллар"),
+    "CAD": ("canadian dollar", "канадский доллар"),
+    "AUD": ("australian dollar", "австралийский доллар"),
+    "NZD": ("new zealand dollar", "новозеландский доллар"),
+    "THB": ("baht", "฿", "бат", "тайский бат"),
+    "VND": ("dong", "₫", "донг"),
+    "IDR": ("rupiah", "рупия", "индонезийская рупия"),
+    "PLN": ("zloty", "złoty", "zł", "злотый"),
+    "CZK": ("czech koruna", "koruna", "крона", "чешская крона"),
+    "SEK": ("swedish krona", "krona", "крона", "шведская крона"),
+    "NOK": ("norwegian krone", "krone", "крона", "норвежская крона"),
+    "DKK": ("danish krone", "krone", "крона", "датская крона"),
+    "HUF": ("forint", "форинт"),
+    "BGN": ("lev", "лев", "болгарский лев"),
+    "RSD": ("serbian dinar", "dinar", "динар", "сербский динар"),
+    "BRL": ("real", "brazilian real", "R$", "реал", "бразильский реал"),
+    "ZAR": ("rand", "рэнд", "ранд"),
+    "EGP": ("egyptian pound", "египетский фунт"),
+    "QAR": ("qatari riyal", "riyal", "риал", "катарский риал"),
+    "SAR": ("saudi riyal", "riyal", "риял", "саудовский риял"),
+    "OMR": ("omani rial", "rial", "риал", "оманский риал"),
+    "BHD": ("bahraini dinar", "dinar", "динар", "бахрейнский динар"),
+    "IRR": ("iranian rial", "rial", "риал", "иранский риал"),
+    "DZD": ("algerian dinar", "dinar", "динар", "алжирский динар"),
+    "MNT": ("tugrik", "₮", "тугрик"),
+    "NGN": ("naira", "₦", "найра"),
+    "ETB": ("birr", "быр"),
+    "CUP": ("cuban peso", "peso", "песо", "кубинское песо"),
+    "BOB": ("boliviano", "боливиано"),
+    "MMK": ("kyat", "кьят"),
+    "XDR": ("sdr", "special drawing rights", "сдр", "специальные права заимствования"),
+}
+
+
+def load_currency_names(path: str = CURRENCY_NAMES_FILE) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build_index(currencies, cbr_names: dict) -> TextIndex:
+    names = {}
+    for code in currencies:
+        aliases = [code, *CURRENCY_ALIASES.get(code, ())]
+        if cbr_names.get(code):
+            aliases.append(cbr_names[code])
+        names[code] = aliases
+    return TextIndex(names)
+
+
+# (snapshot generation, index); replaced as a whole when the rates change
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_search_index() -> TextIndex:
+    global _index
+    snapshot = get_snapshot()
+    generation = snapshot.generation if snapshot is not None else None
+    cached = _index
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+
+    with _index_lock:
+        if _index is not None and _index[0] == generation:
+            return _index[1]
+        currencies = snapshot.currencies if snapshot is not None else DEFAULT_CURRENCIES
+        index = build_index(currencies, load_currency_names())
+        _index = (generation, index)
+        logger.info(f"Built currency search index for {len(currencies)} currencies ({len(index.terms)} terms)")
+    return index
+
+
+def search_currencies(text: str, limit: int = SEARCH_LIMIT) -> tuple:
+    """
+    Resolves free text ("евро", "дирхам", "yuan", "$", "kzt") to currency
+    codes available in the current snapshot.
+    """
+    return get_search_index().search(text, limit)
+
+
+def lookup_currencies(text: str) -> tuple:
+    """
+    Currency codes whose code, name or alias is exactly text; no prefix or
+    typo matching.
+    """
+    return get_search_index().lookup(text)
@@ -1,139 +1,651 @@
 import requests
+import argparse
 import json
 import logging
-from datetime import datetime
+import random
+import statistics
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from contextlib import closing
+from datetime import date, datetime, timedelta
 from xml.etree import ElementTree
 import os
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('exchange_rates.log'),
-        logging.StreamHandler()
-    ]
-)
+from requests.adapters import HTTPAdapter
+
+from currency_search import CURRENCY_NAMES_FILE, load_currency_names
+from history import compact, connect, currency_series, fetched_dates, record_rates, write_requested_dates, write_snapshot
+from ratefile import atomic_write, write_rates
+
 logger = logging.getLogger(__name__)
 
 # CBR API URL
 CBR_URL = "https://www.cbr.ru/scripts/XML_daily.asp"
 
-def fetch_cbr_rates():
+# HTTP fetch settings
+FETCH_TIMEOUT = (5, 15)  # connect, read (seconds)
+FETCH_RETRIES = 3
+FETCH_BACKOFF = 0.5  # seconds, doubled on every retry and jittered
+FETCH_POOL_SIZE = 2
+FETCH_STATE_FILE = "exchange_rates.http.json"  # ETag / Last-Modified of the last saved fetch
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+PARSE_CHUNK_SIZE = 16 * 1024  # bytes fed to the XML parser at a time
+
+# Rate providers. RATE_POLICY is one of:
+#   "priority" - the first provider in order that answered within its deadline
+#   "first"    - whichever provider answers successfully first
+#   "median"   - per-currency median of at least RATE_QUORUM providers, dropping
+#                values more than RATE_MAX_DEVIATION away from the median
+CBR_JSON_URL = "https://www.cbr-xml-daily.ru/daily_json.js"
+RATE_OVERRIDE_FILE = "exchange_rates.override.json"
+RATE_POLICY = "priority"
+RATE_QUORUM = 2
+RATE_MAX_DEVIATION = 0.02
+PROVIDER_DEADLINE = 20  # seconds per provider
+
+# Backfill settings
+BACKFILL_WORKERS = 4
+BACKFILL_BATCH_SIZE = 50
+BACKFILL_TIMEOUT = (5, 30)  # connect, read (seconds)
+
+# Fetch / update outcomes
+FETCHED = "fetched"
+NOT_MODIFIED = "not_modified"
+UNCHANGED = "unchanged"  # fetched, but identical to the saved rates
+FAILED = "failed"
+KEPT_PREVIOUS = "failed_kept_previous"
+
+# status: one of the outcomes above; validators: {"etag", "last_modified"} of the response
+# effective_date / currencies come from the parsed document (see ParsedRates)
+# source: name of the provider(s) the rates came from
+FetchResult = namedtuple("FetchResult", ["status", "rates", "validators", "attempts", "error",
+                                         "effective_date", "currencies", "source"],
+                         defaults=(None, None, None))
+
+# One parsed XML_daily.asp document.
+# rates: "<CODE>_RUB" -> RUB per 1 unit; currencies: CODE -> CurrencyInfo
+ParsedRates = namedtuple("ParsedRates", ["effective_date", "rates", "currencies"])
+CurrencyInfo = namedtuple("CurrencyInfo", ["num_code", "name", "nominal"])
+UpdateResult = namedtuple("UpdateResult", ["status", "rates", "fetch"])
+
+def make_session(pool_size: int = FETCH_POOL_SIZE) -> requests.Session:
     """
-    Fetches exchange rates from Central Bank of Russia.
-    Returns a dictionary with currency codes and their rates.
+    Creates an HTTP session with a keep-alive pool of pool_size connections.
     """
-    try:
-        response = requests.get(CBR_URL)
-        response.encoding = 'utf-8'  # CBR uses windows-1251/utf-8
-        
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session() -> requests.Session:
+    """
+    Returns the process-wide session used for regular rate updates.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+def _number(text: str) -> float:
+    return float(text.replace(',', '.'))
+
+def parse_cbr_xml(content: bytes) -> ParsedRates:
+    """
+    Parses a CBR XML_daily.asp document straight from the response bytes.
+    The parser honours the encoding declared in the XML (CBR serves
+    windows-1251); it is fed the document in chunks and every Valute is
+    detached from ValCurs once it is read, so memory stays flat.
+    Returns the ValCurs date, the rates and the Name/NumCode of each currency.
+    """
+    effective_date = None
+    rates = {}
+    currencies = {}
+    fields = {}
+    root = None
+
+    # XMLPullParser rather than iterparse: same events, without the
+    # iterator iterparse sets up on every call
+    parser = ElementTree.XMLPullParser(events=("start", "end"))
+    for offset in range(0, len(content), PARSE_CHUNK_SIZE):
+        parser.feed(content[offset:offset + PARSE_CHUNK_SIZE])
+        for event, elem in parser.read_events():
+            if event == "end":
+                tag = elem.tag
+                if tag == "Valute":
+                    nominal = _number(fields["Nominal"])
+                    code = fields["CharCode"]
+
+                    # Calculate rate per 1 unit
+                    rates[f"{code}_RUB"] = _number(fields["Value"]) / nominal
+                    currencies[code] = CurrencyInfo(fields.get("NumCode"), fields.get("Name"), nominal)
+
+                    root.remove(elem)
+                    fields = {}
+                else:
+                    fields[tag] = elem.text
+            elif root is None:
+                # ValCurs: its Date is known as soon as it opens
+                root = elem
+                valcurs_date = elem.get("Date")
+                if valcurs_date:
+                    effective_date = datetime.strptime(valcurs_date, "%d.%m.%Y").date()
+    parser.close()
+
+    return ParsedRates(effective_date, rates, currencies)
+
+def fetch_cbr(on_date: date = None, session: requests.Session = None, url: str = CBR_URL,
+              timeout=FETCH_TIMEOUT, retries: int = FETCH_RETRIES, validators: dict = None,
+              deadline: float = None) -> FetchResult:
+    """
+    Fetches exchange rates from Central Bank of Russia, for today or for
+    on_date if given. Connection errors and 429/5xx replies are retried with
+    jittered exponential backoff. With validators from an earlier fetch the
+    request is conditional, and a 304 reply skips parsing entirely.
+    With a deadline (seconds), each attempt's timeouts are cut to the time
+    left and no retry is started once its backoff would pass the deadline.
+    """
+    params = {"date_req": on_date.strftime("%d/%m/%Y")} if on_date else None
+    headers = {}
+    if validators:
+        if validators.get("etag"):
+            headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"):
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    session = session or get_session()
+    give_up = time.monotonic() + deadline if deadline else None
+    error = None
+    for attempt in range(1, retries + 2):
+        if attempt > 1:
+            delay = FETCH_BACKOFF * 2 ** (attempt - 2) * random.uniform(0.5, 1.5)
+            if give_up is not None and time.monotonic() + delay >= give_up:
+                attempt -= 1
+                logger.warning(f"No time left to retry within the {deadline}s deadline")
+                break
+            time.sleep(delay)
+        attempt_timeout = timeout
+        if give_up is not None:
+            left = give_up - time.monotonic()
+            attempt_timeout = (min(timeout[0], left), min(timeout[1], left))
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=attempt_timeout)
+        except requests.RequestException as e:
+            error = f"Network error: {e}"
+            logger.warning(f"{error} (attempt {attempt})")
+            continue
+
+        if response.status_code == 304:
+            return FetchResult(NOT_MODIFIED, None, validators, attempt, None)
+
+        if response.status_code in RETRY_STATUSES:
+            error = f"HTTP {response.status_code}"
+            logger.warning(f"Failed to fetch rates: {error} (attempt {attempt})")
+            continue
+
         if response.status_code != 200:
-            logger.error(f"Failed to fetch rates: HTTP {response.status_code}")
-            return None
+            error = f"HTTP {response.status_code}"
+            break
 
-        # Parse XML
-        root = ElementTree.fromstring(response.text)
-        
-        # Initialize rates dictionary
-        rates = {}
-        
-        # Process each currency
-        for valute in root.findall('Valute'):
-            code = valute.find('CharCode').text
-            nominal = float(valute.find('Nominal').text.replace(',', '.'))
-            value = float(valute.find('Value').text.replace(',', '.'))
-            
-            # Calculate rate per 1 unit
-            rate = value / nominal
-            rates[f"{code}_RUB"] = rate
+        try:
+            parsed = parse_cbr_xml(response.content)
+        except (ElementTree.ParseError, ValueError, KeyError) as e:
+            error = f"XML parsing error: {e}"
+            break
+        except Exception as e:
+            error = f"Unexpected error: {e}"
+            break
 
-        return rates
+        new_validators = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified")
+        }
+        return FetchResult(FETCHED, parsed.rates, new_validators, attempt, None,
+                           parsed.effective_date, parsed.currencies)
 
-    except requests.RequestException as e:
-        logger.error(f"Network error: {e}")
-        return None
-    except ElementTree.ParseError as e:
-        logger.error(f"XML parsing error: {e}")
-        return None
-    except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+    logger.error(f"Failed to fetch rates: {error}")
+    return FetchResult(FAILED, None, None, attempt, error)
+
+def fetch_cbr_rates(on_date: date = None, session: requests.Session = None, url: str = CBR_URL,
+                    timeout=FETCH_TIMEOUT):
+    """
+    Fetches exchange rates from Central Bank of Russia, for today or for
+    on_date if given.
+    Returns a dictionary with currency codes and their rates, or None.
+    """
+    return fetch_cbr(on_date, session, url, timeout).rates
+
+#
+# Rate providers
+#
+
+class RateProvider:
+    """
+    A source of CBR rates. fetch() must return a FetchResult and must not
+    take much longer than deadline seconds.
+    """
+    name = "provider"
+
+    def __init__(self, deadline: float = PROVIDER_DEADLINE):
+        self.deadline = deadline
+
+    def fetch(self, validators: dict = None) -> FetchResult:
+        raise NotImplementedError
+
+class CbrXmlProvider(RateProvider):
+    """
+    The official XML_daily.asp endpoint. The only provider that supports
+    conditional requests.
+    """
+    name = "cbr_xml"
+
+    def __init__(self, url: str = CBR_URL, deadline: float = PROVIDER_DEADLINE):
+        super().__init__(deadline)
+        self.url = url
+
+    def fetch(self, validators: dict = None) -> FetchResult:
+        return fetch_cbr(url=self.url, validators=validators, deadline=self.deadline)._replace(source=self.name)
+
+class CbrJsonProvider(RateProvider):
+    """
+    JSON mirror of the CBR daily rates (daily_json.js format).
+    """
+    name = "cbr_json"
+
+    def __init__(self, url: str = CBR_JSON_URL, deadline: float = PROVIDER_DEADLINE):
+        super().__init__(deadline)
+        self.url = url
+
+    def fetch(self, validators: dict = None) -> FetchResult:
+        try:
+            response = get_session().get(self.url, timeout=(FETCH_TIMEOUT[0], self.deadline))
+            if response.status_code != 200:
+                return FetchResult(FAILED, None, None, 1, f"HTTP {response.status_code}", source=self.name)
+            data = response.json()
+            rates = {}
+            currencies = {}
+            for code, valute in data["Valute"].items():
+                nominal = float(valute["Nominal"])
+                rates[f"{code}_RUB"] = float(valute["Value"]) / nominal
+                currencies[code] = CurrencyInfo(valute.get("NumCode"), valute.get("Name"), nominal)
+            effective_date = datetime.fromisoformat(data["Date"]).date() if data.get("Date") else None
+        except (requests.RequestException, ValueError, KeyError, TypeError) as e:
+            return FetchResult(FAILED, None, None, 1, f"{type(e).__name__}: {e}", source=self.name)
+        return FetchResult(FETCHED, rates, None, 1, None, effective_date, currencies, self.name)
+
+class LocalOverrideProvider(RateProvider):
+    """
+    Rates from a local JSON file ("<CODE>_RUB": rate, optional
+    "effective_date": "YYYY-MM-DD"), for manual overrides. Fails when the
+    file does not exist.
+    """
+    name = "local_override"
+
+    def __init__(self, path: str = RATE_OVERRIDE_FILE, deadline: float = PROVIDER_DEADLINE):
+        super().__init__(deadline)
+        self.path = path
+
+    def fetch(self, validators: dict = None) -> FetchResult:
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            effective_date = data.pop("effective_date", None)
+            rates = {key: float(value) for key, value in data.items() if key.endswith("_RUB")}
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            return FetchResult(FAILED, None, None, 1, f"{type(e).__name__}: {e}", source=self.name)
+        if effective_date:
+            effective_date = date.fromisoformat(effective_date)
+        return FetchResult(FETCHED, rates, None, 1, None, effective_date, None, self.name)
+
+def default_providers() -> list:
+    """
+    Providers in priority order.
+    """
+    return [CbrXmlProvider(), CbrJsonProvider(), LocalOverrideProvider()]
+
+def _median_result(results: list, quorum: int, max_deviation: float) -> FetchResult:
+    """
+    Combines successful results into per-currency medians. Values further
+    than max_deviation (relative) from the median are dropped, and a currency
+    needs at least quorum agreeing values to be kept.
+    """
+    if len(results) < quorum:
+        return FetchResult(FAILED, None, None, 1, f"Only {len(results)} of {quorum} providers answered")
+
+    keys = set().union(*(result.rates for result in results))
+    rates = {}
+    for key in keys:
+        values = [result.rates[key] for result in results if key in result.rates]
+        median = statistics.median(values)
+        agreeing = [value for value in values if abs(value - median) <= max_deviation * median]
+        if len(agreeing) < len(values):
+            logger.warning(f"{key}: dropped {len(values) - len(agreeing)} value(s) deviating from median {median}")
+        if len(agreeing) >= quorum:
+            rates[key] = statistics.median(agreeing)
+
+    if "USD_RUB" not in rates:
+        return FetchResult(FAILED, None, None, 1, "Providers disagree on USD_RUB")
+
+    dates = [result.effective_date for result in results if result.effective_date]
+    currencies = next((result.currencies for result in results if result.currencies), None)
+    source = "median(" + ",".join(result.source for result in results) + ")"
+    return FetchResult(FETCHED, rates, None, 1, None, max(dates) if dates else None, currencies, source)
+
+def fetch_rates(providers: list = None, policy: str = None, validators: dict = None,
+                quorum: int = RATE_QUORUM, max_deviation: float = RATE_MAX_DEVIATION) -> FetchResult:
+    """
+    Queries all providers concurrently and picks a result by policy.
+    Waits at most the largest provider deadline; providers that are still
+    running then are abandoned and count as failed.
+    """
+    providers = providers if providers is not None else default_providers()
+    policy = policy or RATE_POLICY
+    if policy not in ("priority", "first", "median"):
+        raise ValueError(f"Unknown rate policy: {policy}")
+    # Conditional requests only make sense when a single source is chosen
+    validators = validators if policy != "median" else None
+
+    pool = ThreadPoolExecutor(max_workers=len(providers), thread_name_prefix="rate-provider")
+    started = time.monotonic()
+    futures = {pool.submit(provider.fetch, validators): provider for provider in providers}
+    results = {}
+    try:
+        pending = set(futures)
+        while pending:
+            now = time.monotonic() - started
+            # Drop providers whose own deadline passed
+            for future in [f for f in pending if futures[f].deadline <= now]:
+                pending.discard(future)
+                logger.warning(f"Provider {futures[future].name} missed its {futures[future].deadline}s deadline")
+            if not pending:
+                break
+            timeout = min(futures[f].deadline for f in pending) - now
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = FetchResult(FAILED, None, None, 1, f"Unexpected error: {e}", source=provider.name)
+                results[provider] = result
+                if result.status == FAILED:
+                    logger.warning(f"Provider {provider.name} failed: {result.error}")
+                elif policy == "first":
+                    return result
+
+            if policy == "priority":
+                # Stop as soon as every provider ranked above the best answer has failed
+                for provider in providers:
+                    result = results.get(provider)
+                    if result is None:
+                        break
+                    if result.status != FAILED:
+                        return result
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    succeeded = [results[p] for p in providers if p in results and results[p].status != FAILED]
+    if policy == "median":
+        fetched = [result for result in succeeded if result.status == FETCHED]
+        return _median_result(fetched, quorum, max_deviation)
+    if succeeded:
+        return succeeded[0]
+    errors = "; ".join(f"{p.name}: {results[p].error if p in results else 'timed out'}" for p in providers)
+    return FetchResult(FAILED, None, None, 1, errors)
+
+def load_validators():
+    """
+    Loads the ETag / Last-Modified of the last saved fetch, if any.
+    """
+    try:
+        with open(FETCH_STATE_FILE, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
         return None
 
-def save_rates(rates):
+def save_validators(validators):
+    try:
+        atomic_write(FETCH_STATE_FILE, json.dumps(validators).encode("utf-8"))
+    except OSError as e:
+        logger.error(f"Error saving fetch validators: {e}")
+
+def save_currency_names(currencies: dict) -> None:
+    """
+    Keeps the CBR currency names (CODE -> Name) for the bot's currency search.
+    The file is rewritten only when the names changed.
     """
-    Saves rates to JSON file with current timestamp.
+    names = {code: info.name for code, info in sorted(currencies.items()) if info.name}
+    if not names or names == load_currency_names():
+        return
+    try:
+        atomic_write(CURRENCY_NAMES_FILE, json.dumps(names, ensure_ascii=False, indent=2).encode("utf-8"))
+        logger.info(f"Saved names of {len(names)} currencies")
+    except OSError as e:
+        logger.error(f"Error saving currency names: {e}")
+
+def save_rates(rates, effective_date: date = None):
+    """
+    Saves rates to JSON file with current timestamp and the date the rates
+    are effective from (CBR ValCurs Date), and to the binary rate file that
+    bot processes memory-map. Both files are replaced atomically.
     """
     if rates is None:
         logger.error("No rates to save")
         return False
 
+    now = datetime.now()
+    effective_date = effective_date or now.date()
     data = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": now.isoformat(),
+        "effective_date": effective_date.isoformat(),
         **rates
     }
     
     try:
-        with open("exchange_rates.json", "w") as f:
-            json.dump(data, f, indent=2)
-        logger.info("Exchange rates saved successfully")
+        atomic_write("exchange_rates.json", json.dumps(data, indent=2).encode("utf-8"))
+        version = write_rates(rates, now.timestamp(), effective_date)
+        logger.info(f"Exchange rates effective {effective_date} saved successfully (version {version})")
         return True
     except Exception as e:
         logger.error(f"Error saving rates: {e}")
         return False
 
-def load_existing_rates():
+def load_saved_rates():
     """
     Loads existing rates from JSON file.
-    Returns rates dictionary if file exists, None otherwise.
+    Returns (rates, effective_date); both are None if there is no file.
     """
     try:
         if not os.path.exists("exchange_rates.json"):
-            return None
+            return None, None
 
         with open("exchange_rates.json", "r") as f:
             data = json.load(f)
             
-        # Remove timestamp from rates
+        # Remove metadata from rates
         data.pop("timestamp", None)
-        return data
+        effective_date = data.pop("effective_date", None)
+        return data, date.fromisoformat(effective_date) if effective_date else None
     except Exception as e:
         logger.error(f"Error loading existing rates: {e}")
-        return None
+        return None, None
+
+def load_existing_rates():
+    """
+    Loads existing rates from JSON file.
+    Returns rates dictionary if file exists, None otherwise.
+    """
+    return load_saved_rates()[0]
 
-def update_rates():
+def update_rates(providers: list = None, policy: str = None) -> UpdateResult:
     """
     Main function to update exchange rates.
-    Always updates timestamp, preserves rates if API fetch fails.
+    Writes the rate files only when the rates really changed, so the binary
+    file version (and every cache keyed on it) moves only on real changes.
+    Preserves rates if the fetch fails.
+    Returns an UpdateResult telling what happened.
     """
     # Load existing rates
-    existing_rates = load_existing_rates()
+    existing_rates, existing_date = load_saved_rates()
     
-    # Fetch new rates
-    logger.info("Fetching new rates from CBR")
-    new_rates = fetch_cbr_rates()
+    # Fetch new rates, conditionally if we have rates to fall back on
+    logger.info(f"Fetching new rates ({policy or RATE_POLICY} policy)")
+    validators = load_validators() if existing_rates is not None else None
+    fetch = fetch_rates(providers, policy, validators)
+
+    if fetch.status == NOT_MODIFIED:
+        logger.info("Rates not modified since last fetch")
+        return UpdateResult(NOT_MODIFIED, existing_rates, fetch)
     
-    if new_rates is None:
+    if fetch.status == FAILED:
         if existing_rates is None:
             logger.error("Failed to fetch new rates and no existing rates available")
-            return None
+            return UpdateResult(FAILED, None, fetch)
         
-        logger.warning("Failed to fetch new rates, keeping existing rates with updated timestamp")
-        save_rates(existing_rates)
-        return existing_rates
+        logger.warning("Failed to fetch new rates, keeping existing rates")
+        return UpdateResult(KEPT_PREVIOUS, existing_rates, fetch)
     
-    # Save new rates with current timestamp
-    save_rates(new_rates)
-    return new_rates
+    if fetch.currencies:
+        save_currency_names(fetch.currencies)
+
+    # Keep every fetched day in the history store, under the date CBR set the rates for
+    new_rates = fetch.rates
+    effective_date = fetch.effective_date or date.today()
+    record_rates(effective_date, new_rates)
+
+    if new_rates == existing_rates and effective_date == existing_date:
+        logger.info(f"Rates from {fetch.source} unchanged, nothing to write")
+        save_validators(fetch.validators or {})
+        return UpdateResult(UNCHANGED, existing_rates, fetch)
+
+    changed = sorted(
+        key for key in new_rates.keys() | (existing_rates or {}).keys()
+        if new_rates.get(key) != (existing_rates or {}).get(key)
+    )
+    logger.info(f"{len(changed)} rate(s) changed: {', '.join(changed[:10])}{'...' if len(changed) > 10 else ''}")
+    if save_rates(new_rates, effective_date):
+        # Validators only describe the CBR XML response; forget them otherwise
+        save_validators(fetch.validators or {})
+    logger.info(f"Rates taken from {fetch.source}")
+    return UpdateResult(FETCHED, new_rates, fetch)
+
+def _write_batch(conn, batch: dict, resolved: list) -> None:
+    with conn:
+        for day, rates in batch.items():
+            write_snapshot(conn, day, rates)
+        write_requested_dates(conn, resolved)
+    logger.info(f"Stored {len(batch)} days of rates")
+
+def backfill(start: date, end: date, workers: int = BACKFILL_WORKERS, url: str = CBR_URL,
+             batch_size: int = BACKFILL_BATCH_SIZE):
+    """
+    Fetches the rates for every date in [start, end] that is not in the
+    history store yet, using a bounded pool of workers over one session.
+    Like update_rates, each result is stored under its ValCurs date: a day
+    without new rates (weekend, holiday) yields the previous rates, which
+    are stored once under the date CBR set them for. Such past days are
+    noted as requested, so later runs do not fetch them again.
+    Results are written in batches, one transaction per batch.
+    Returns (stored, failed) day counts.
+    """
+    fetched = fetched_dates(start, end)
+    days = [start + timedelta(days=i) for i in range((end - start).days + 1)]
+    days = [day for day in days if day.isoformat() not in fetched]
+    logger.info(f"Backfilling {len(days)} days ({len(fetched)} already stored)")
+
+    written = failed = 0
+    session = make_session(pool_size=workers)
+    with closing(session), closing(connect()) as conn, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(fetch_cbr, day, session, url, BACKFILL_TIMEOUT): day
+            for day in days
+        }
+        # effective date -> rates; several requested days can share one
+        batch = {}
+        # (requested day, earlier effective date)
+        resolved = []
+        for future in as_completed(futures):
+            day = futures[future]
+            result = future.result()
+            if not result.rates:
+                failed += 1
+                logger.error(f"No rates fetched for {day}")
+                continue
+            effective_date = result.effective_date or day
+            # A future day may still get rates of its own
+            if effective_date != day and day <= date.today():
+                resolved.append((day, effective_date))
+            if effective_date.isoformat() not in fetched:
+                batch[effective_date] = result.rates
+                fetched.add(effective_date.isoformat())
+            if len(batch) >= batch_size:
+                _write_batch(conn, batch, resolved)
+                written += len(batch)
+                batch, resolved = {}, []
+        if batch or resolved:
+            _write_batch(conn, batch, resolved)
+            written += len(batch)
+
+    logger.info(f"Backfill finished: {written} days stored, {failed} failed")
+    return written, failed
 
 def main():
     """
-    Runs the exchange rate update process once and exits.
+    Runs the exchange rate update process once and exits, or works on the
+    rate history: "backfill --from ... --to ...", "compact", or
+    "series CODE --from ... --to ..." to print one currency's rates.
     """
-    rates = update_rates()
-    if rates:
+    # Only when run as the updater; the bot configures its own logging
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('exchange_rates.log'),
+            logging.StreamHandler()
+        ]
+    )
+    parser = argparse.ArgumentParser(description="CBR exchange rate updater")
+    commands = parser.add_subparsers(dest="command")
+    backfill_parser = commands.add_parser("backfill", help="Fetch historical rates into the history store")
+    backfill_parser.add_argument("--from", dest="start", type=date.fromisoformat, required=True,
+                                 help="First date, YYYY-MM-DD")
+    backfill_parser.add_argument("--to", dest="end", type=date.fromisoformat, default=date.today(),
+                                 help="Last date, YYYY-MM-DD (default: today)")
+    backfill_parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    backfill_parser.add_argument("--url", default=CBR_URL, help="XML_daily.asp endpoint")
+    commands.add_parser("compact", help="Merge unchanged rates in the history store into date ranges")
+    series_parser = commands.add_parser("series", help="Print one currency's stored rates")
+    series_parser.add_argument("code", type=str.upper, help="Currency code, e.g. USD")
+    series_parser.add_argument("--from", dest="start", type=date.fromisoformat, required=True,
+                               help="First date, YYYY-MM-DD")
+    series_parser.add_argument("--to", dest="end", type=date.fromisoformat, default=date.today(),
+                               help="Last date, YYYY-MM-DD (default: today)")
+    parser.add_argument("--policy", choices=("priority", "first", "median"), default=RATE_POLICY,
+                        help="How to combine rate providers")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        _, failed = backfill(args.start, args.end, args.workers, args.url)
+        raise SystemExit(1 if failed else 0)
+    if args.command == "compact":
+        compact()
+        return
+    if args.command == "series":
+        for day, rate in currency_series(args.code, args.start, args.end):
+            print(f"{day}\t{'-' if rate is None else f'{rate:.4f}'}")
+        return
+
+    result = update_rates(policy=args.policy)
+    logger.info(f"Update result: {result.status} after {result.fetch.attempts} attempt(s)")
+    if result.rates:
         logger.info("Current rates:")
-        for currency, rate in rates.items():
+        for currency, rate in result.rates.items():
             logger.info(f"{currency}: {rate:.4f}")
     else:
         logger.error("Failed to update rates")
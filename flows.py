@@ -0,0 +1,119 @@
+from conversation import (
+    AmountStep,
+    ConfirmStep,
+    CountryStep,
+    CurrencyStep,
+    Flow,
+    Menu,
+    Option,
+    PhoneStep,
+    PreviewStep,
+    TextStep,
+    build_states
+)
+from handlers import commission_prompt
+from records import (
+    AgentExporterRecord,
+    AgentImporterRecord,
+    ExporterRecord,
+    ImporterRecord,
+    PhysicalRecord
+)
+from states import MAIN_MENU
+
+
+def importer_commission(record: ImporterRecord, lang: str) -> str:
+    return commission_prompt(record.commission_percent, record.commission_message, lang)
+
+
+#
+# -------------------------------------------------------------------
+# Flows: country -> currency -> amount -> ... -> preview -> admin chat.
+# The preview and admin texts are "preview_<flow>" and "admin_<flow>"; the
+# record type (records.py) has a field for every step that stores one.
+# -------------------------------------------------------------------
+#
+
+Flow("importer", ImporterRecord, (
+    CountryStep(prompt="importer_country"),
+    CurrencyStep(),
+    AmountStep(minimum="importer", commission=True),
+    ConfirmStep("commission", importer_commission),
+    TextStep("inn", "enter_inn"),
+    TextStep("purpose", "enter_purpose"),
+    PhoneStep(),
+    PreviewStep(("country", "amount", "currency", "inn", "purpose", "phone")),
+))
+
+Flow("exporter", ExporterRecord, (
+    CountryStep(prompt="exporter_country"),
+    CurrencyStep(),
+    AmountStep(),
+    ConfirmStep("commission", "exporter_commission"),
+    TextStep("sender_details", "enter_sender_details"),
+    TextStep("receiver_details", "enter_receiver_details"),
+    PhoneStep(),
+    PreviewStep(("country", "amount", "currency", "purpose", "sender_details", "receiver_details", "phone")),
+))
+
+Flow("physical", PhysicalRecord, (
+    CountryStep(prompt="importer_country"),
+    CurrencyStep(),
+    AmountStep(minimum="physical"),
+    ConfirmStep("commission", "physical_commission"),
+    PhoneStep(),
+    PreviewStep(("choice", "country", "amount", "currency", "phone")),
+))
+
+Flow("agent_importer", AgentImporterRecord, (
+    CountryStep(prompt="agent_importer_country"),
+    CurrencyStep(),
+    AmountStep(minimum="importer", commission=True),
+    ConfirmStep("commission", importer_commission),
+    TextStep("inn", "enter_inn"),
+    TextStep("purpose", "enter_purpose"),
+    PhoneStep(),
+    PreviewStep(("country", "amount", "currency", "inn", "purpose", "phone")),
+))
+
+Flow("agent_exporter", AgentExporterRecord, (
+    CountryStep(prompt="agent_exporter_country"),
+    CurrencyStep(),
+    AmountStep(),
+    ConfirmStep("commission", "exporter_commission"),
+    TextStep("sender_details", "enter_sender_details"),
+    TextStep("receiver_details", "enter_receiver_details"),
+    PhoneStep(),
+    PreviewStep(("country", "amount", "currency", "purpose", "sender_details", "receiver_details", "phone")),
+))
+
+
+#
+# -------------------------------------------------------------------
+# Menus: intent (see intents.py) -> flow or menu
+# -------------------------------------------------------------------
+#
+
+Menu(MAIN_MENU, reply="main_menu", ends_flow=True, options=(
+    Option("importer", "importer"),
+    Option("exporter", "exporter"),
+    Option("individual", "physical_menu"),
+    Option("agent", "agent_menu"),
+))
+
+Menu("physical_menu", prompt="physical_menu_prompt", keyboard="physical_menu",
+     fallback_text="select_from_menu", options=(
+    Option("transfer_self", "physical", {"choice": "physical_choice_self"}),
+    Option("transfer_relative", "physical", {"choice": "physical_choice_relative"}),
+    Option("pay_services", "physical", {"choice": "physical_choice_services"}),
+    Option("back", MAIN_MENU),
+))
+
+Menu("agent_menu", prompt="agent_menu", keyboard="agent_menu", fallback=MAIN_MENU, options=(
+    Option("agent_importer", "agent_importer"),
+    Option("agent_exporter", "agent_exporter"),
+))
+
+
+def conversation_states() -> dict:
+    return build_states()
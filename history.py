@@ -0,0 +1,259 @@
+import logging
+import sqlite3
+from contextlib import closing
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+# History of CBR rates, keyed by effective date.
+# exchange_rates.json is only the latest view derived from it.
+HISTORY_DB = "exchange_history.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    effective_date TEXT PRIMARY KEY,    -- YYYY-MM-DD
+    fetched_at     TEXT NOT NULL
+) WITHOUT ROWID;
+
+-- Dates that were fetched but have no rates of their own (weekends,
+-- holidays): CBR answered with the rates it set on effective_date
+CREATE TABLE IF NOT EXISTS requested_dates (
+    requested_date TEXT PRIMARY KEY,
+    effective_date TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS currencies (
+    code TEXT PRIMARY KEY
+) WITHOUT ROWID;
+
+-- One row per currency per run of stored dates with the same rate: the rate
+-- holds for every snapshot from effective_date through valid_to. A currency
+-- missing from a snapshot has no row covering it. The (code, effective_date)
+-- key keeps both "as of" lookups and per-currency range scans on the index.
+CREATE TABLE IF NOT EXISTS rates (
+    code           TEXT NOT NULL,
+    effective_date TEXT NOT NULL,
+    valid_to       TEXT NOT NULL,
+    rate           REAL NOT NULL,
+    PRIMARY KEY (code, effective_date)
+) WITHOUT ROWID;
+"""
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    """
+    Opens the history database, creating the tables if needed.
+    """
+    conn = sqlite3.connect(path or HISTORY_DB)
+    conn.executescript(SCHEMA)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(rates)")]
+    if "valid_to" not in columns:
+        # Databases from before validity ranges: every row covers its own date
+        with conn:
+            conn.execute("ALTER TABLE rates ADD COLUMN valid_to TEXT NOT NULL DEFAULT ''")
+            conn.execute("UPDATE rates SET valid_to = effective_date")
+    return conn
+
+
+def _day(value) -> str:
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)
+
+
+def _neighbour_dates(conn: sqlite3.Connection, day: str) -> tuple:
+    """
+    The stored snapshot dates just before and just after day (None if none).
+    """
+    before = conn.execute("SELECT MAX(effective_date) FROM snapshots WHERE effective_date < ?", (day,)).fetchone()
+    after = conn.execute("SELECT MIN(effective_date) FROM snapshots WHERE effective_date > ?", (day,)).fetchone()
+    return before[0], after[0]
+
+
+def write_snapshot(conn: sqlite3.Connection, effective_date, rates: dict, fetched_at: str = None) -> None:
+    """
+    Adds one day of "<CODE>_RUB" rates inside the caller's transaction.
+    Refetching a date replaces that date's rates. A range that covered the
+    date (a compacted run, or the date itself) is split around it, so
+    backfilling a gap never changes the rates of other dates.
+    """
+    day = _day(effective_date)
+    codes = [(key[:-4],) for key in rates if key.endswith("_RUB")]
+    before, after = _neighbour_dates(conn, day)
+
+    covering = conn.execute("""
+        SELECT r.code, r.effective_date, r.valid_to, r.rate
+        FROM currencies c JOIN rates r ON r.code = c.code AND r.effective_date = (
+            SELECT MAX(effective_date) FROM rates WHERE code = c.code AND effective_date <= ?
+        )
+        WHERE r.valid_to >= ?
+    """, (day, day)).fetchall()
+    for code, valid_from, valid_to, rate in covering:
+        conn.execute("DELETE FROM rates WHERE code = ? AND effective_date = ?", (code, valid_from))
+        if valid_from < day:
+            conn.execute("INSERT INTO rates (code, effective_date, valid_to, rate) VALUES (?, ?, ?, ?)",
+                         (code, valid_from, before, rate))
+        if valid_to > day:
+            conn.execute("INSERT INTO rates (code, effective_date, valid_to, rate) VALUES (?, ?, ?, ?)",
+                         (code, after, valid_to, rate))
+
+    conn.execute(
+        "INSERT OR REPLACE INTO snapshots (effective_date, fetched_at) VALUES (?, ?)",
+        (day, fetched_at or datetime.now().isoformat())
+    )
+    conn.executemany("INSERT OR IGNORE INTO currencies (code) VALUES (?)", codes)
+    conn.executemany(
+        "INSERT INTO rates (code, effective_date, valid_to, rate) VALUES (?, ?, ?, ?)",
+        [(code, day, day, rates[f"{code}_RUB"]) for (code,) in codes]
+    )
+
+
+def write_requested_dates(conn: sqlite3.Connection, resolved: list) -> None:
+    """
+    Notes, inside the caller's transaction, requested dates that resolved
+    to an earlier effective date: [(requested_date, effective_date), ...].
+    """
+    conn.executemany(
+        "INSERT OR REPLACE INTO requested_dates (requested_date, effective_date) VALUES (?, ?)",
+        [(_day(requested), _day(effective)) for requested, effective in resolved]
+    )
+
+
+def record_rates(effective_date, rates: dict, fetched_at: str = None) -> bool:
+    """
+    Stores one day of rates. Returns True on success.
+    """
+    try:
+        with closing(connect()) as conn, conn:
+            write_snapshot(conn, effective_date, rates, fetched_at)
+        return True
+    except sqlite3.Error as e:
+        logger.error(f"Error recording rate history: {e}")
+        return False
+
+
+def _snapshot_date(conn: sqlite3.Connection, day) -> str:
+    """
+    The latest stored snapshot date on or before day, or None.
+    """
+    row = conn.execute("SELECT MAX(effective_date) FROM snapshots WHERE effective_date <= ?", (_day(day),)).fetchone()
+    return row[0]
+
+
+def rates_as_of(day) -> dict:
+    """
+    Returns the "<CODE>_RUB" rates that were effective on the given date:
+    those of the latest snapshot on or before it. Returns None if the
+    history has nothing on or before the date.
+    """
+    with closing(connect()) as conn:
+        snapshot_date = _snapshot_date(conn, day)
+        if snapshot_date is None:
+            return None
+        # One index seek per currency: its latest range starting on or before
+        # the snapshot, which must still cover it
+        rows = conn.execute("""
+            SELECT r.code, r.rate
+            FROM currencies c JOIN rates r ON r.code = c.code AND r.effective_date = (
+                SELECT MAX(effective_date) FROM rates WHERE code = c.code AND effective_date <= ?
+            )
+            WHERE r.valid_to >= ?
+        """, (snapshot_date, snapshot_date)).fetchall()
+    rates = {f"{code}_RUB": rate for code, rate in rows}
+    return rates or None
+
+
+def currency_series(code: str, start, end) -> list:
+    """
+    Returns [(effective_date, rate), ...] for one currency for every stored
+    date in [start, end], oldest first. rate is None on dates whose
+    snapshot did not quote the currency.
+    """
+    start, end = _day(start), _day(end)
+    with closing(connect()) as conn:
+        dates = conn.execute(
+            "SELECT effective_date FROM snapshots WHERE effective_date BETWEEN ? AND ? ORDER BY effective_date",
+            (start, end)
+        ).fetchall()
+        ranges = conn.execute(
+            "SELECT effective_date, valid_to, rate FROM rates "
+            "WHERE code = ? AND effective_date <= ? AND valid_to >= ? ORDER BY effective_date",
+            (code, end, start)
+        ).fetchall()
+
+    series = []
+    ranges = iter(ranges)
+    current = next(ranges, None)
+    for (day,) in dates:
+        while current is not None and current[1] < day:
+            current = next(ranges, None)
+        covered = current is not None and current[0] <= day
+        series.append((day, current[2] if covered else None))
+    return series
+
+
+def stored_dates(start, end) -> set:
+    """
+    Returns the effective dates (YYYY-MM-DD) already stored in [start, end].
+    """
+    with closing(connect()) as conn:
+        rows = conn.execute(
+            "SELECT effective_date FROM snapshots WHERE effective_date BETWEEN ? AND ?",
+            (_day(start), _day(end))
+        ).fetchall()
+    return {row[0] for row in rows}
+
+
+def fetched_dates(start, end) -> set:
+    """
+    Returns the dates (YYYY-MM-DD) in [start, end] that need no fetch: the
+    stored effective dates and the requested dates that had no rates of
+    their own.
+    """
+    start, end = _day(start), _day(end)
+    with closing(connect()) as conn:
+        rows = conn.execute("""
+            SELECT effective_date FROM snapshots WHERE effective_date BETWEEN ? AND ?
+            UNION
+            SELECT requested_date FROM requested_dates WHERE requested_date BETWEEN ? AND ?
+        """, (start, end, start, end)).fetchall()
+    return {row[0] for row in rows}
+
+
+def compact() -> int:
+    """
+    Merges each currency's ranges that follow one another with the same
+    rate into one. Every stored date keeps its rate; a later write to any
+    date splits the merged range again. Returns the number of rows removed.
+    """
+    with closing(connect()) as conn:
+        with conn:
+            dates = [row[0] for row in conn.execute("SELECT effective_date FROM snapshots ORDER BY effective_date")]
+            next_date = dict(zip(dates, dates[1:]))
+            codes = [row[0] for row in conn.execute("SELECT code FROM currencies")]
+
+            removed = 0
+            for code in codes:
+                rows = conn.execute(
+                    "SELECT effective_date, valid_to, rate FROM rates WHERE code = ? ORDER BY effective_date",
+                    (code,)
+                ).fetchall()
+                # [start, end, rate, end before merging] per run of equal rates
+                runs, merged = [], []
+                for valid_from, valid_to, rate in rows:
+                    run = runs[-1] if runs else None
+                    if run and rate == run[2] and next_date.get(run[1]) == valid_from:
+                        merged.append((code, valid_from))
+                        run[1] = valid_to
+                    else:
+                        runs.append([valid_from, valid_to, rate, valid_to])
+                extended = [(end, code, start) for start, end, _, initial_end in runs if end != initial_end]
+
+                conn.executemany("DELETE FROM rates WHERE code = ? AND effective_date = ?", merged)
+                conn.executemany("UPDATE rates SET valid_to = ? WHERE code = ? AND effective_date = ?", extended)
+                removed += len(merged)
+        conn.execute("VACUUM")
+    logger.info(f"Compacted rate history, removed {removed} rows")
+    return removed
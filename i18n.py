@@ -0,0 +1,87 @@
+import json
+import logging
+import os
+from string import Formatter
+
+logger = logging.getLogger(__name__)
+
+# One <lang>.json per language: {"key": "text", ...}. Texts may contain
+# str.format placeholders such as {currency} or {amount:.2f}.
+LOCALES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "locales")
+DEFAULT_LANG = "ru"
+
+
+class Template:
+    """
+    A catalog text with placeholders, split into (literal, field, format_spec)
+    parts once at load time so rendering does not re-parse the text.
+    """
+    __slots__ = ("text", "parts", "fields")
+
+    def __init__(self, text: str):
+        parts = []
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is not None and (not field.isidentifier() or conversion):
+                raise ValueError(f"Unsupported placeholder {{{field}}} in {text!r}")
+            parts.append((literal, field, spec))
+        self.text = text
+        self.parts = tuple(parts)
+        self.fields = frozenset(field for _, field, _ in parts if field is not None)
+
+    def render(self, params: dict) -> str:
+        out = []
+        for literal, field, spec in self.parts:
+            out.append(literal)
+            if field is not None:
+                out.append(format(params[field], spec))
+        return "".join(out)
+
+
+def _compile(text: str):
+    """
+    Plain texts stay str; texts with placeholders become a Template.
+    """
+    template = Template(text)
+    return template if template.fields else text
+
+
+def load_catalog(directory: str = LOCALES_DIR) -> dict:
+    """
+    Reads every <lang>.json in directory into one {(key, lang): text} dict.
+    """
+    catalog = {}
+    keys_by_lang = {}
+    for filename in sorted(os.listdir(directory)):
+        lang, ext = os.path.splitext(filename)
+        if ext != ".json":
+            continue
+        with open(os.path.join(directory, filename), "r", encoding="utf-8") as f:
+            texts = json.load(f)
+        for key, text in texts.items():
+            catalog[(key, lang)] = _compile(text)
+        keys_by_lang[lang] = set(texts)
+
+    # Texts that exist in only some languages (e.g. the Russian-only admin
+    # notifications) are allowed, but worth seeing in the log
+    all_keys = set().union(*keys_by_lang.values()) if keys_by_lang else set()
+    for lang, keys in keys_by_lang.items():
+        missing = all_keys - keys
+        if missing:
+            logger.debug(f"Locale {lang} has no text for: {', '.join(sorted(missing))}")
+    return catalog
+
+
+CATALOG = load_catalog()
+LANGUAGES = tuple(sorted({lang for _, lang in CATALOG}))
+
+
+def translate(key: str, lang: str, **params) -> str:
+    """
+    Looks up the text for (key, lang) and fills in its placeholders.
+    """
+    text = CATALOG.get((key, lang))
+    if text is None:
+        return f"[MISSING TEXT {key}_{lang}]"
+    if type(text) is str:
+        return text
+    return text.render(params)
@@ -0,0 +1,87 @@
+from i18n import LANGUAGES, translate as _
+from textindex import KeywordAutomaton, normalize
+
+# intent id -> (button text keys, other phrases). Button labels are taken from
+# every language's catalog; phrases count as whole words anywhere in a reply.
+INTENT_PHRASES = {
+    "yes": (("button_yes",), ("yes", "да")),
+    "no": (("button_no",), ("no", "нет")),
+
+    "importer": (("button_importer",), ("импортер", "importer")),
+    "exporter": (("button_exporter",), ("экспортер", "exporter")),
+    "individual": (("button_individual",), ("физ", "физлицо", "физическое лицо", "individual")),
+    "agent": (("button_agent",), ("агент", "agent")),
+
+    "transfer_self": (("button_transfer_self",), ("перевод себе", "transfer to self")),
+    "transfer_relative": (("button_transfer_relative",), ("перевод родственнику", "transfer to relative")),
+    "pay_services": (("button_pay_services",), ("оплата услуг", "pay for services")),
+    "back": (("button_back_to_menu",), ("назад", "back")),
+
+    "agent_importer": ((), ("1",)),
+    "agent_exporter": ((), ("2",)),
+}
+
+YES_NO = frozenset(("yes", "no"))
+
+
+def _is_boundary(text: str, i: int) -> bool:
+    return i <= 0 or i >= len(text) or not (text[i - 1].isalnum() and text[i].isalnum())
+
+
+class IntentMatcher:
+    """
+    Maps a reply to an intent id: a reply that is exactly a known label or
+    phrase is one dict lookup; otherwise one pass of a keyword automaton
+    collects every phrase found as whole words. A reply naming two different
+    intents ("нет, да") matches neither.
+    """
+    __slots__ = ("exact", "automaton")
+
+    def __init__(self, phrases: dict):
+        """
+        phrases: intent id -> iterable of labels and phrases.
+        """
+        exact = {}
+        for intent, texts in phrases.items():
+            for text in texts:
+                term = normalize(text)
+                if exact.setdefault(term, intent) != intent:
+                    raise ValueError(f"{text!r} is both {exact[term]} and {intent}")
+        self.exact = exact
+        self.automaton = KeywordAutomaton(exact)
+
+    def match(self, text: str, intents=None):
+        """
+        Returns the one intent (among intents, if given) that text names,
+        or None.
+        """
+        term = normalize(text)
+        intent = self.exact.get(term)
+        if intent is not None:
+            return intent if intents is None or intent in intents else None
+
+        found = None
+        for start, end, intent in self.automaton.find(term):
+            if intents is not None and intent not in intents:
+                continue
+            if not (_is_boundary(term, start) and _is_boundary(term, end)):
+                continue
+            if found is not None and found != intent:
+                return None
+            found = intent
+        return found
+
+
+def build_matcher() -> IntentMatcher:
+    phrases = {}
+    for intent, (button_keys, extra) in INTENT_PHRASES.items():
+        labels = [_(key, lang) for key in button_keys for lang in LANGUAGES]
+        phrases[intent] = (*labels, *extra)
+    return IntentMatcher(phrases)
+
+
+INTENTS = build_matcher()
+
+
+def match_intent(text: str, intents=None):
+    return INTENTS.match(text, intents)
@@ -0,0 +1,208 @@
+from telegram import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    ReplyKeyboardMarkup,
+    ReplyKeyboardRemove
+)
+
+from countries import POPULAR_COUNTRIES, country_name
+from i18n import DEFAULT_LANG, LANGUAGES, translate as _
+from rates import DEFAULT_CURRENCIES, get_snapshot, subscribe
+
+
+class FrozenMarkup:
+    """
+    Mixin for reply markups that never change once built. PTB serializes the
+    markup with to_json() on every send; here that happens once, in __init__.
+    """
+    __slots__ = ()
+
+    def _freeze(self) -> None:
+        object.__setattr__(self, "_json", super().to_json())
+
+    def to_json(self) -> str:
+        return self._json
+
+    def __setattr__(self, key: str, value: object) -> None:
+        if hasattr(self, "_json"):
+            raise AttributeError(f"{type(self).__name__} is immutable")
+        super().__setattr__(key, value)
+
+
+class FrozenReplyKeyboardMarkup(FrozenMarkup, ReplyKeyboardMarkup):
+    __slots__ = ("_json",)
+
+    def __init__(self, keyboard, **kwargs):
+        super().__init__(keyboard, **kwargs)
+        self.keyboard = tuple(tuple(row) for row in self.keyboard)
+        self._id_attrs = (self.keyboard,)
+        self._freeze()
+
+
+class FrozenInlineKeyboardMarkup(FrozenMarkup, InlineKeyboardMarkup):
+    __slots__ = ("_json",)
+
+    def __init__(self, inline_keyboard, **kwargs):
+        super().__init__(tuple(tuple(row) for row in inline_keyboard), **kwargs)
+        self._freeze()
+
+
+class FrozenReplyKeyboardRemove(FrozenMarkup, ReplyKeyboardRemove):
+    __slots__ = ("_json",)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._freeze()
+
+
+REMOVE_KEYBOARD = FrozenReplyKeyboardRemove()
+
+# Inline currency picker: "cur:<CODE>" selects, "curpage:<n>" turns the page
+CURRENCY_CALLBACK = "cur:"
+CURRENCY_PAGE_CALLBACK = "curpage:"
+CURRENCY_NOOP_CALLBACK = "curnoop"
+CURRENCIES_PER_PAGE = 12
+CURRENCY_COLUMNS = 3
+
+# Inline country picker: "country:<ISO code>" selects
+COUNTRY_CALLBACK = "country:"
+COUNTRY_COLUMNS = 2
+
+
+def reply_keyboard(rows) -> FrozenReplyKeyboardMarkup:
+    return FrozenReplyKeyboardMarkup(rows, one_time_keyboard=True, resize_keyboard=True)
+
+
+#
+# -------------------------------------------------------------------
+# Registry
+# -------------------------------------------------------------------
+#
+
+# keyboard id -> (builder, rate_dependent). Static builders take (lang) and
+# are built for every language at registration; rate-dependent builders take
+# (lang, snapshot) and are built on first use for each snapshot generation.
+_builders = {}
+_static = {}
+_rate_keyboards = {}
+
+
+def register(keyboard_id: str, builder, rate_dependent: bool = False) -> None:
+    _builders[keyboard_id] = (builder, rate_dependent)
+    if not rate_dependent:
+        for lang in LANGUAGES:
+            _static[(keyboard_id, lang)] = builder(lang)
+
+
+def get_keyboard(keyboard_id: str, lang: str):
+    """
+    Returns the shared, immutable markup for (keyboard_id, lang).
+    Raises KeyError for an unknown keyboard id.
+    """
+    markup = _static.get((keyboard_id, lang))
+    if markup is not None:
+        return markup
+
+    builder, rate_dependent = _builders[keyboard_id]
+    if lang not in LANGUAGES:
+        lang = DEFAULT_LANG
+    if not rate_dependent:
+        return _static[(keyboard_id, lang)]
+
+    snapshot = get_snapshot()
+    key = (snapshot.generation if snapshot is not None else None, keyboard_id, lang)
+    markup = _rate_keyboards.get(key)
+    if markup is None:
+        markup = _rate_keyboards[key] = builder(lang, snapshot)
+    return markup
+
+
+def clear_rate_keyboards(snapshot) -> None:
+    _rate_keyboards.clear()
+
+subscribe(clear_rate_keyboards)
+
+
+#
+# -------------------------------------------------------------------
+# Keyboards
+# -------------------------------------------------------------------
+#
+
+register("yes_no", lambda lang: reply_keyboard([[_("button_yes", lang), _("button_no", lang)]]))
+
+register("main_menu", lambda lang: reply_keyboard([
+    [_("button_importer", lang), _("button_exporter", lang)],
+    [_("button_individual", lang), _("button_agent", lang)]
+]))
+
+register("physical_menu", lambda lang: reply_keyboard([
+    [_("button_transfer_self", lang), _("button_transfer_relative", lang)],
+    [_("button_pay_services", lang), _("button_back_to_menu", lang)]
+]))
+
+register("agent_menu", lambda lang: reply_keyboard([["1", "2"]]))
+
+register("currency", lambda lang: reply_keyboard([list(DEFAULT_CURRENCIES) + ["Others"]]))
+
+
+def currency_button_rows(codes) -> list:
+    return [
+        [InlineKeyboardButton(code, callback_data=f"{CURRENCY_CALLBACK}{code}")
+         for code in codes[i:i + CURRENCY_COLUMNS]]
+        for i in range(0, len(codes), CURRENCY_COLUMNS)
+    ]
+
+
+def currency_choice_keyboard(codes) -> FrozenInlineKeyboardMarkup:
+    """
+    Inline buttons for a handful of candidate currencies, e.g. search results.
+    """
+    return FrozenInlineKeyboardMarkup(currency_button_rows(tuple(codes)))
+
+
+def build_currency_pages(lang: str, snapshot) -> tuple:
+    """
+    Every page of the inline currency picker for the snapshot's currencies.
+    """
+    currencies = snapshot.currencies if snapshot is not None else DEFAULT_CURRENCIES
+    page_count = max(1, -(-len(currencies) // CURRENCIES_PER_PAGE))
+    pages = []
+    for page in range(page_count):
+        rows = currency_button_rows(currencies[page * CURRENCIES_PER_PAGE:(page + 1) * CURRENCIES_PER_PAGE])
+        if page_count > 1:
+            nav = []
+            if page > 0:
+                nav.append(InlineKeyboardButton("◀️", callback_data=f"{CURRENCY_PAGE_CALLBACK}{page - 1}"))
+            nav.append(InlineKeyboardButton(f"{page + 1}/{page_count}", callback_data=CURRENCY_NOOP_CALLBACK))
+            if page < page_count - 1:
+                nav.append(InlineKeyboardButton("▶️", callback_data=f"{CURRENCY_PAGE_CALLBACK}{page + 1}"))
+            rows.append(nav)
+        pages.append(FrozenInlineKeyboardMarkup(rows))
+    return tuple(pages)
+
+register("currency_pages", build_currency_pages, rate_dependent=True)
+
+def country_flag(code: str) -> str:
+    # Two regional indicator symbols render as the country's flag
+    return "".join(chr(0x1F1E6 + ord(letter) - ord("A")) for letter in code)
+
+
+def country_choice_keyboard(codes, lang: str) -> FrozenInlineKeyboardMarkup:
+    """
+    Inline buttons for a handful of countries, e.g. search results.
+    """
+    codes = tuple(codes)
+    return FrozenInlineKeyboardMarkup([
+        [InlineKeyboardButton(f"{country_flag(code)} {country_name(code, lang)}",
+                              callback_data=f"{COUNTRY_CALLBACK}{code}")
+         for code in codes[i:i + COUNTRY_COLUMNS]]
+        for i in range(0, len(codes), COUNTRY_COLUMNS)
+    ])
+
+register("countries", lambda lang: country_choice_keyboard(POPULAR_COUNTRIES, lang))
+
+register("language", lambda lang: FrozenInlineKeyboardMarkup([[
+    InlineKeyboardButton("🇷🇺 Русский", callback_data="set_lang_ru"),
+    InlineKeyboardButton("🇬🇧 English", callback_data="set_lang_en")
+]]))
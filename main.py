@@ -1,128 +1,82 @@
+import logging
+
+from telegram import Update
 from telegram.ext import (
-    Updater,
     CommandHandler,
-    MessageHandler,
-    Filters,
     ConversationHandler,
-    CallbackQueryHandler
+    CallbackQueryHandler,
+    TypeHandler
 )
+import config
 from config import BOT_TOKEN
+from flows import conversation_states
+from persistence import SQLitePersistence, drop_stale_conversations, start_write_behind
+from rates import refresh_rates_job
+from sessions import SessionLimits, start_session_sweeper, touch_session
+from runtime import build_updater
+from webhook import ALLOWED_UPDATES, register_webhook
 from handlers import (
     start,
-    main_menu,
     about_command,
     language_command,
     language_callback,
+    stale_callback,
     cancel_command,
     help_command,
     contact_command,
     faq_command,
     go_back_to_main_menu,
-
-    # Agent
-    agent_submenu,
-    agent_importer_country,
-    agent_importer_amount,
-    agent_importer_currency,
-    agent_importer_commission_choice,
-    agent_importer_inn,
-    agent_importer_purpose,
-    agent_importer_phone,
-    agent_importer_preview_choice,
-
-    agent_exporter_country,
-    agent_exporter_amount,
-    agent_exporter_currency,
-    agent_exporter_purpose,
-    agent_exporter_commission_choice,
-    agent_exporter_sender_details,
-    agent_exporter_receiver_details,
-    agent_exporter_phone,
-    agent_exporter_preview_choice,
-
-    # Importer
-    importer_country,
-    importer_amount,
-    importer_currency,
-    importer_commission_choice,
-    importer_inn,
-    importer_purpose,
-    importer_phone,
-    importer_preview_choice,
-
-    # Exporter
-    exporter_country,
-    exporter_amount,
-    exporter_currency,
-    exporter_purpose,
-    exporter_commission_choice,
-    exporter_sender_details,
-    exporter_receiver_details,
-    exporter_phone,
-    exporter_preview_choice,
-
-    # Physical
-    physical_choices,
-    physical_country,
-    physical_amount,
-    physical_currency,
-    physical_commission_choice,
-    physical_phone,
-    physical_preview_choice,
-)
-from states import (
-    MAIN_MENU,
-    IMPORTER_COUNTRY,
-    IMPORTER_AMOUNT,
-    IMPORTER_CURRENCY,
-    IMPORTER_COMMISSION_CHOICE,
-    IMPORTER_INN,
-    IMPORTER_PURPOSE,
-    IMPORTER_PHONE,
-    IMPORTER_PREVIEW,
-
-    EXPORTER_COUNTRY,
-    EXPORTER_AMOUNT,
-    EXPORTER_CURRENCY,
-    EXPORTER_PURPOSE,
-    EXPORTER_COMMISSION_CHOICE,
-    EXPORTER_SENDER_DETAILS,
-    EXPORTER_RECEIVER_DETAILS,
-    EXPORTER_PHONE,
-    EXPORTER_PREVIEW,
-
-    PHYSICAL_CHOICES,
-    PHYSICAL_COUNTRY,
-    PHYSICAL_AMOUNT,
-    PHYSICAL_CURRENCY,
-    PHYSICAL_COMMISSION_CHOICE,
-    PHYSICAL_PHONE,
-    PHYSICAL_PREVIEW,
-
-    AGENT_SUBMENU,
-    AGENT_IMPORTER_COUNTRY,
-    AGENT_IMPORTER_AMOUNT,
-    AGENT_IMPORTER_CURRENCY,
-    AGENT_IMPORTER_COMMISSION_CHOICE,
-    AGENT_IMPORTER_INN,
-    AGENT_IMPORTER_PURPOSE,
-    AGENT_IMPORTER_PHONE,
-    AGENT_IMPORTER_PREVIEW,
-
-    AGENT_EXPORTER_COUNTRY,
-    AGENT_EXPORTER_AMOUNT,
-    AGENT_EXPORTER_CURRENCY,
-    AGENT_EXPORTER_PURPOSE,
-    AGENT_EXPORTER_COMMISSION_CHOICE,
-    AGENT_EXPORTER_SENDER_DETAILS,
-    AGENT_EXPORTER_RECEIVER_DETAILS,
-    AGENT_EXPORTER_PHONE,
-    AGENT_EXPORTER_PREVIEW
+    stats_command,
+    rates_command,
 )
 
-def main():
-    updater = Updater(BOT_TOKEN, use_context=True)
-    dp = updater.dispatcher
+# Optional: refresh exchange rates inside the bot every N seconds (0 = rely on exchange.py cron)
+RATES_REFRESH_INTERVAL = getattr(config, "RATES_REFRESH_INTERVAL", 0)
+
+# Session memory (seconds / bytes, 0 = no limit): a conversation idle for
+# CONVERSATION_TIMEOUT ends and its flow data is dropped; users idle for
+# SESSION_TTL lose everything but their language; above SESSION_MEMORY_BUDGET
+# the least recently seen sessions idle for SESSION_MIN_IDLE are evicted.
+CONVERSATION_TIMEOUT = getattr(config, "CONVERSATION_TIMEOUT", 30 * 60)
+SESSION_TTL = getattr(config, "SESSION_TTL", 7 * 24 * 60 * 60)
+SESSION_MEMORY_BUDGET = getattr(config, "SESSION_MEMORY_BUDGET", 64 * 1024 * 1024)
+SESSION_MIN_IDLE = getattr(config, "SESSION_MIN_IDLE", 5 * 60)
+SESSION_SWEEP_INTERVAL = getattr(config, "SESSION_SWEEP_INTERVAL", 5 * 60)
+
+# Sessions survive restarts in this SQLite file ("" = keep them in memory
+# only); changes are written in batches every SESSIONS_FLUSH_INTERVAL seconds
+# and on shutdown.
+SESSIONS_DB = getattr(config, "SESSIONS_DB", "sessions.db")
+SESSIONS_FLUSH_INTERVAL = getattr(config, "SESSIONS_FLUSH_INTERVAL", 10)
+
+# "polling" or "webhook". The webhook listener serves WEBHOOK_LISTEN:WEBHOOK_PORT
+# at /WEBHOOK_PATH (TLS is left to the reverse proxy) and, when WEBHOOK_URL is
+# set, registers that public URL with Telegram; without it the listener only
+# takes updates POSTed to it (see webhook.py). Requests must carry
+# WEBHOOK_SECRET, if set, in the X-Telegram-Bot-Api-Secret-Token header.
+BOT_MODE = getattr(config, "BOT_MODE", "polling")
+WEBHOOK_LISTEN = getattr(config, "WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = getattr(config, "WEBHOOK_PORT", 8443)
+WEBHOOK_PATH = getattr(config, "WEBHOOK_PATH", "bot")
+WEBHOOK_URL = getattr(config, "WEBHOOK_URL", "")
+WEBHOOK_SECRET = getattr(config, "WEBHOOK_SECRET", "")
+WEBHOOK_MAX_CONNECTIONS = getattr(config, "WEBHOOK_MAX_CONNECTIONS", 40)
+
+# "threads" (a thread pool) and "asyncio" (an event loop feeding the pool)
+# handle different chats concurrently on HANDLER_THREADS threads and each
+# chat's updates in order (see runtime.py); "sequential" is PTB's dispatcher,
+# one update at a time. The HTTP connection pool gets HTTP_POOL_SIZE
+# connections, at least HANDLER_THREADS + 4 (0 = exactly that).
+RUNTIME = getattr(config, "RUNTIME", "threads")
+HANDLER_THREADS = getattr(config, "HANDLER_THREADS", 8)
+HTTP_POOL_SIZE = getattr(config, "HTTP_POOL_SIZE", 0)
+
+def add_handlers(dp, persistent: bool = False) -> ConversationHandler:
+    """
+    Registers every handler of the bot; returns the conversation handler.
+    """
+    # Session activity, ahead of every other handler
+    dp.add_handler(TypeHandler(Update, touch_session), group=-1)
 
     # Global commands (outside conv)
     dp.add_handler(CommandHandler("help", help_command))
@@ -130,6 +84,8 @@ def main():
     dp.add_handler(CommandHandler("contact", contact_command))
     dp.add_handler(CommandHandler("about", about_command))
     dp.add_handler(CommandHandler("language", language_command))
+    dp.add_handler(CommandHandler("stats", stats_command))
+    dp.add_handler(CommandHandler("rates", rates_command))
 
     # Callback queries (for language switch)
     dp.add_handler(CallbackQueryHandler(language_callback, pattern=r"^set_lang_"))
@@ -137,148 +93,7 @@ def main():
     # Conversation
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler("start", start)],
-        states={
-            MAIN_MENU: [
-                MessageHandler(Filters.text & ~Filters.command, main_menu)
-            ],
-
-            # AGENT SUBMENU
-            AGENT_SUBMENU: [
-                MessageHandler(Filters.text & ~Filters.command, agent_submenu),
-            ],
-            # Agent Importer
-            AGENT_IMPORTER_COUNTRY: [
-                MessageHandler(Filters.text & ~Filters.command, agent_importer_country),
-            ],
-            AGENT_IMPORTER_AMOUNT: [
-                MessageHandler(Filters.text & ~Filters.command, agent_importer_amount),
-            ],
-            AGENT_IMPORTER_CURRENCY: [
-                MessageHandler(Filters.text & ~Filters.command, agent_importer_currency),
-            ],
-            AGENT_IMPORTER_COMMISSION_CHOICE: [
-                MessageHandler(Filters.text & ~Filters.command, agent_importer_commission_choice),
-            ],
-            AGENT_IMPORTER_INN: [
-                MessageHandler(Filters.text & ~Filters.command, agent_importer_inn),
-            ],
-            AGENT_IMPORTER_PURPOSE: [
-                MessageHandler(Filters.text & ~Filters.command, agent_importer_purpose),
-            ],
-            AGENT_IMPORTER_PHONE: [
-                MessageHandler(Filters.text & ~Filters.command, agent_importer_phone),
-            ],
-            AGENT_IMPORTER_PREVIEW: [
-                MessageHandler(Filters.text & ~Filters.command, agent_importer_preview_choice),
-            ],
-
-            # Agent Exporter
-            AGENT_EXPORTER_COUNTRY: [
-                MessageHandler(Filters.text & ~Filters.command, agent_exporter_country),
-            ],
-            AGENT_EXPORTER_AMOUNT: [
-                MessageHandler(Filters.text & ~Filters.command, agent_exporter_amount),
-            ],
-            AGENT_EXPORTER_CURRENCY: [
-                MessageHandler(Filters.text & ~Filters.command, agent_exporter_currency),
-            ],
-            AGENT_EXPORTER_PURPOSE: [
-                MessageHandler(Filters.text & ~Filters.command, agent_exporter_purpose),
-            ],
-            AGENT_EXPORTER_COMMISSION_CHOICE: [
-                MessageHandler(Filters.text & ~Filters.command, agent_exporter_commission_choice),
-            ],
-            AGENT_EXPORTER_SENDER_DETAILS: [
-                MessageHandler(Filters.text & ~Filters.command, agent_exporter_sender_details),
-            ],
-            AGENT_EXPORTER_RECEIVER_DETAILS: [
-                MessageHandler(Filters.text & ~Filters.command, agent_exporter_receiver_details),
-            ],
-            AGENT_EXPORTER_PHONE: [
-                MessageHandler(Filters.text & ~Filters.command, agent_exporter_phone),
-            ],
-            AGENT_EXPORTER_PREVIEW: [
-                MessageHandler(Filters.text & ~Filters.command, agent_exporter_preview_choice),
-            ],
-
-            # Importer
-            IMPORTER_COUNTRY: [
-                MessageHandler(Filters.text & ~Filters.command, importer_country),
-            ],
-            IMPORTER_AMOUNT: [
-                MessageHandler(Filters.text & ~Filters.command, importer_amount),
-            ],
-            IMPORTER_CURRENCY: [
-                MessageHandler(Filters.text & ~Filters.command, importer_currency),
-            ],
-            IMPORTER_COMMISSION_CHOICE: [
-                MessageHandler(Filters.text & ~Filters.command, importer_commission_choice),
-            ],
-            IMPORTER_INN: [
-                MessageHandler(Filters.text & ~Filters.command, importer_inn),
-            ],
-            IMPORTER_PURPOSE: [
-                MessageHandler(Filters.text & ~Filters.command, importer_purpose),
-            ],
-            IMPORTER_PHONE: [
-                MessageHandler(Filters.text & ~Filters.command, importer_phone),
-            ],
-            IMPORTER_PREVIEW: [
-                MessageHandler(Filters.text & ~Filters.command, importer_preview_choice),
-            ],
-
-            # Exporter
-            EXPORTER_COUNTRY: [
-                MessageHandler(Filters.text & ~Filters.command, exporter_country),
-            ],
-            EXPORTER_AMOUNT: [
-                MessageHandler(Filters.text & ~Filters.command, exporter_amount),
-            ],
-            EXPORTER_CURRENCY: [
-                MessageHandler(Filters.text & ~Filters.command, exporter_currency),
-            ],
-            EXPORTER_PURPOSE: [
-                MessageHandler(Filters.text & ~Filters.command, exporter_purpose),
-            ],
-            EXPORTER_COMMISSION_CHOICE: [
-                MessageHandler(Filters.text & ~Filters.command, exporter_commission_choice),
-            ],
-            EXPORTER_SENDER_DETAILS: [
-                MessageHandler(Filters.text & ~Filters.command, exporter_sender_details),
-            ],
-            EXPORTER_RECEIVER_DETAILS: [
-                MessageHandler(Filters.text & ~Filters.command, exporter_receiver_details),
-            ],
-            EXPORTER_PHONE: [
-                MessageHandler(Filters.text & ~Filters.command, exporter_phone),
-            ],
-            EXPORTER_PREVIEW: [
-                MessageHandler(Filters.text & ~Filters.command, exporter_preview_choice),
-            ],
-
-            # Physical
-            PHYSICAL_CHOICES: [
-                MessageHandler(Filters.text & ~Filters.command, physical_choices),
-            ],
-            PHYSICAL_COUNTRY: [
-                MessageHandler(Filters.text & ~Filters.command, physical_country),
-            ],
-            PHYSICAL_AMOUNT: [
-                MessageHandler(Filters.text & ~Filters.command, physical_amount),
-            ],
-            PHYSICAL_CURRENCY: [
-                MessageHandler(Filters.text & ~Filters.command, physical_currency),
-            ],
-            PHYSICAL_COMMISSION_CHOICE: [
-                MessageHandler(Filters.text & ~Filters.command, physical_commission_choice),
-            ],
-            PHYSICAL_PHONE: [
-                MessageHandler(Filters.text & ~Filters.command, physical_phone),
-            ],
-            PHYSICAL_PREVIEW: [
-                MessageHandler(Filters.text & ~Filters.command, physical_preview_choice),
-            ],
-        },
+        states=conversation_states(),
         fallbacks=[
             CommandHandler("cancel", cancel_command),
             CommandHandler("menu", go_back_to_main_menu),
@@ -286,12 +101,53 @@ def main():
             CommandHandler("contact", contact_command),
             CommandHandler("faq", faq_command),
         ],
+        conversation_timeout=CONVERSATION_TIMEOUT or None,
+        name="main",
+        persistent=persistent,
     )
 
     dp.add_handler(conv_handler)
 
-    updater.start_polling()
+    # Callback queries nothing above took (stale buttons), in the same group
+    # so that a query is never answered twice
+    dp.add_handler(CallbackQueryHandler(stale_callback))
+    return conv_handler
+
+
+def main():
+    # The bot's only logging setup; exchange.py configures its own only when run as the updater
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    persistence = SQLitePersistence(SESSIONS_DB) if SESSIONS_DB else None
+    updater = build_updater(BOT_TOKEN, RUNTIME, HANDLER_THREADS, persistence, WEBHOOK_SECRET, HTTP_POOL_SIZE)
+    dp = updater.dispatcher
+
+    if persistence:
+        start_write_behind(updater.job_queue, persistence, SESSIONS_FLUSH_INTERVAL)
+
+    if RATES_REFRESH_INTERVAL:
+        updater.job_queue.run_repeating(refresh_rates_job, interval=RATES_REFRESH_INTERVAL, first=0)
+
+    conv_handler = add_handlers(dp, persistent=persistence is not None)
+    if persistence:
+        drop_stale_conversations(conv_handler)
+
+    start_session_sweeper(
+        dp, [conv_handler],
+        SessionLimits(SESSION_TTL, SESSION_MEMORY_BUDGET, SESSION_MIN_IDLE),
+        SESSION_SWEEP_INTERVAL
+    )
+
+    if BOT_MODE == "webhook":
+        if WEBHOOK_URL:
+            register_webhook(updater.bot, WEBHOOK_URL, WEBHOOK_SECRET, WEBHOOK_MAX_CONNECTIONS)
+        updater.start_webhook(listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT, url_path=WEBHOOK_PATH)
+    elif BOT_MODE == "polling":
+        updater.start_polling(allowed_updates=ALLOWED_UPDATES)
+    else:
+        raise ValueError(f"Unknown BOT_MODE {BOT_MODE!r}, expected 'polling' or 'webhook'")
     updater.idle()
+    if persistence:
+        persistence.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
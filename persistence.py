@@ -0,0 +1,266 @@
+import json
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from telegram.ext import BasePersistence, CallbackContext
+
+logger = logging.getLogger(__name__)
+
+# user_data, chat_data and conversation states, so a restart keeps every
+# user's language and the step of the flow they are in.
+SESSIONS_DB = "sessions.db"
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+
+-- data is the pickled dict (flow records included)
+CREATE TABLE IF NOT EXISTS user_data (
+    id   INTEGER PRIMARY KEY,
+    data BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS chat_data (
+    id   INTEGER PRIMARY KEY,
+    data BLOB NOT NULL
+);
+
+-- key is the JSON list of the ConversationHandler key, state its JSON value
+CREATE TABLE IF NOT EXISTS conversations (
+    name  TEXT NOT NULL,
+    key   TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (name, key)
+) WITHOUT ROWID;
+"""
+
+
+class SQLitePersistence(BasePersistence):
+    """
+    Write-behind persistence: the dispatcher's per-update calls only note
+    which sessions changed; flush() pickles those and writes them in one
+    transaction. Empty user or chat data deletes the row.
+
+    Everything is loaded once at startup. After that the database is only
+    read for a session that was evicted from memory (see sessions.py) when
+    its user sends an update again. bot_data and callback data are not
+    stored.
+    """
+
+    def __init__(self, path: str = None):
+        super().__init__(store_user_data=True, store_chat_data=True, store_bot_data=False)
+        self.path = path or SESSIONS_DB
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.executescript(SCHEMA)
+        # Held while writing; flush() runs on the job queue and at shutdown
+        self._conn_lock = threading.Lock()
+
+        # Changed since the last flush: id -> the live dict, (name, key) -> state
+        self._dirty_lock = threading.Lock()
+        self._dirty_users = {}
+        self._dirty_chats = {}
+        self._dirty_conversations = {}
+
+        self._user_data = self._chat_data = None
+        self._conversations = {}
+        # Users with a user_data row (as of the last flush)
+        self._stored_users = set()
+
+    # The bot keeps no telegram objects in its data, so the deep copies
+    # BasePersistence makes on every update to swap Bot instances are skipped.
+    @classmethod
+    def replace_bot(cls, obj: object) -> object:
+        return obj
+
+    def insert_bot(self, obj: object) -> object:
+        return obj
+
+    def _load_data(self, table: str) -> defaultdict:
+        data = defaultdict(dict)
+        with self._conn_lock:
+            rows = self._conn.execute(f"SELECT id, data FROM {table}").fetchall()
+        for row_id, blob in rows:
+            try:
+                data[row_id] = pickle.loads(blob)
+            except Exception as e:
+                # e.g. a record type that no longer exists; the user starts over
+                logger.warning(f"Dropping unreadable {table} of {row_id}: {e}")
+        return data
+
+    def get_user_data(self) -> defaultdict:
+        if self._user_data is None:
+            self._user_data = self._load_data("user_data")
+            self._stored_users = set(self._user_data)
+        return self._user_data
+
+    def get_chat_data(self) -> defaultdict:
+        if self._chat_data is None:
+            self._chat_data = self._load_data("chat_data")
+        return self._chat_data
+
+    def get_bot_data(self) -> dict:
+        return {}
+
+    def get_conversations(self, name: str) -> dict:
+        if name not in self._conversations:
+            with self._conn_lock:
+                rows = self._conn.execute("SELECT key, state FROM conversations WHERE name = ?", (name,)).fetchall()
+            self._conversations[name] = {tuple(json.loads(key)): json.loads(state) for key, state in rows}
+        return self._conversations[name]
+
+    def update_user_data(self, user_id: int, data: dict) -> None:
+        with self._dirty_lock:
+            self._dirty_users[user_id] = data
+
+    def update_chat_data(self, chat_id: int, data: dict) -> None:
+        with self._dirty_lock:
+            self._dirty_chats[chat_id] = data
+
+    def update_bot_data(self, data: dict) -> None:
+        pass
+
+    def update_conversation(self, name: str, key: tuple, new_state) -> None:
+        with self._dirty_lock:
+            self._dirty_conversations[(name, key)] = new_state
+
+    def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        """
+        Called before each update. Fills in an evicted session (empty in
+        memory, still stored) from the change not yet flushed, else from
+        the database.
+        """
+        if user_data or user_id not in self._stored_users:
+            return
+        with self._dirty_lock:
+            pending = self._dirty_users.get(user_id)
+        if pending is not None:
+            user_data.update(pending)
+            return
+
+        with self._conn_lock:
+            row = self._conn.execute("SELECT data FROM user_data WHERE id = ?", (user_id,)).fetchone()
+        if row is None:
+            return
+        try:
+            user_data.update(pickle.loads(row[0]))
+        except Exception as e:
+            logger.warning(f"Dropping unreadable user_data of {user_id}: {e}")
+
+    def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        pass
+
+    def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    def _serialize(self, dirty: dict, retry: dict) -> tuple:
+        """
+        (rows to write, ids to delete). A dict changed by a handler while it
+        is pickled is left for the next flush.
+        """
+        rows, deleted = [], []
+        for row_id, data in dirty.items():
+            if not data:
+                deleted.append((row_id,))
+                continue
+            try:
+                rows.append((row_id, pickle.dumps(data, pickle.HIGHEST_PROTOCOL)))
+            except RuntimeError:
+                retry[row_id] = data
+        return rows, deleted
+
+    def flush(self) -> None:
+        """
+        Writes every change noted since the last flush in one transaction.
+        """
+        with self._dirty_lock:
+            users, self._dirty_users = self._dirty_users, {}
+            chats, self._dirty_chats = self._dirty_chats, {}
+            conversations, self._dirty_conversations = self._dirty_conversations, {}
+            for user_id, data in users.items():
+                if data:
+                    self._stored_users.add(user_id)
+                else:
+                    self._stored_users.discard(user_id)
+        if not (users or chats or conversations):
+            return
+
+        started = time.perf_counter()
+        retry_users, retry_chats = {}, {}
+        user_rows, deleted_users = self._serialize(users, retry_users)
+        chat_rows, deleted_chats = self._serialize(chats, retry_chats)
+        states, ended = [], []
+        for (name, key), state in conversations.items():
+            if state is None:
+                ended.append((name, json.dumps(key)))
+            else:
+                states.append((name, json.dumps(key), json.dumps(state)))
+
+        with self._conn_lock:
+            try:
+                self._conn.execute("BEGIN")
+                self._conn.executemany("INSERT OR REPLACE INTO user_data (id, data) VALUES (?, ?)", user_rows)
+                self._conn.executemany("DELETE FROM user_data WHERE id = ?", deleted_users)
+                self._conn.executemany("INSERT OR REPLACE INTO chat_data (id, data) VALUES (?, ?)", chat_rows)
+                self._conn.executemany("DELETE FROM chat_data WHERE id = ?", deleted_chats)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)", states
+                )
+                self._conn.executemany("DELETE FROM conversations WHERE name = ? AND key = ?", ended)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                self._conn.execute("ROLLBACK")
+                logger.error(f"Failed to persist sessions, will retry: {e}")
+                retry_users, retry_chats = users, chats
+                with self._dirty_lock:
+                    for key, state in conversations.items():
+                        self._dirty_conversations.setdefault(key, state)
+
+        if retry_users or retry_chats:
+            with self._dirty_lock:
+                for user_id, data in retry_users.items():
+                    self._dirty_users.setdefault(user_id, data)
+                for chat_id, data in retry_chats.items():
+                    self._dirty_chats.setdefault(chat_id, data)
+
+        logger.debug(f"Persisted {len(user_rows) + len(deleted_users)} users, "
+                     f"{len(chat_rows) + len(deleted_chats)} chats, {len(conversations)} conversations "
+                     f"in {time.perf_counter() - started:.3f} s")
+
+    def close(self) -> None:
+        self.flush()
+        with self._conn_lock:
+            self._conn.close()
+
+
+def flush_sessions(context: CallbackContext) -> None:
+    context.job.context.flush()
+
+
+def start_write_behind(job_queue, persistence: SQLitePersistence, interval: float) -> None:
+    """
+    Flushes the persistence every interval seconds. WebhookUpdater.stop()
+    flushes it once more after the dispatcher has handled its last update.
+
+    The job queue would otherwise hand every user's data to the persistence
+    after each job run (this flush included); jobs that change sessions
+    report them through dispatcher.update_persistence(update) themselves.
+    """
+    job_queue.scheduler.remove_listener(job_queue._update_persistence)
+    job_queue.run_repeating(flush_sessions, interval=interval, first=interval, context=persistence)
+
+
+def drop_stale_conversations(handler) -> None:
+    """
+    Ends restored conversations whose state no longer exists (a flow or
+    step was renamed or removed); those users would otherwise be stuck.
+    """
+    stale = [key for key, state in handler.conversations.items() if state not in handler.states]
+    for key in stale:
+        del handler.conversations[key]
+        handler.persistence.update_conversation(handler.name, key, None)
+    if stale:
+        logger.info(f"Ended {len(stale)} restored conversations in removed states")
@@ -0,0 +1,141 @@
+import os
+import struct
+import tempfile
+from datetime import date
+
+# Binary rate file shared by every bot process on the host.
+#
+# Layout (little-endian):
+#   header   magic "UPRT", layout u16, reserved u16, version u64,
+#            fetched_at f64 (unix time), effective_date u32 (YYYYMMDD), count u32
+#   codes    count * 4 bytes, ASCII currency code padded with NUL
+#   padding  to an 8-byte boundary
+#   values   count * f64, RUB per 1 unit of the currency
+#
+# The file is always replaced with a rename, so a reader either sees the old
+# file or the complete new one. Comparing the header version is enough to
+# know whether anything changed.
+
+BINARY_RATES_FILE = "exchange_rates.bin"
+
+MAGIC = b"UPRT"
+LAYOUT = 1
+HEADER = struct.Struct("<4sHHQdII")
+CODE_SIZE = 4
+
+
+def _values_offset(count: int) -> int:
+    offset = HEADER.size + count * CODE_SIZE
+    return (offset + 7) & ~7
+
+
+def _encode_date(day: date) -> int:
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def _decode_date(value: int) -> date:
+    if not value:
+        return None
+    return date(value // 10000, value // 100 % 100, value % 100)
+
+
+def _parse_header(data: bytes) -> tuple:
+    magic, layout, _, version, fetched_at, effective_date, count = HEADER.unpack_from(data)
+    if magic != MAGIC or layout != LAYOUT:
+        raise ValueError("Not a rate file or unsupported layout")
+    return version, fetched_at, effective_date, count
+
+
+def read_version(path: str = BINARY_RATES_FILE) -> int:
+    """
+    Reads only the header and returns the file's version.
+    Raises OSError if the file is missing, ValueError if it is not a rate file.
+    """
+    with open(path, "rb") as f:
+        data = f.read(HEADER.size)
+    if len(data) < HEADER.size:
+        raise ValueError("Truncated rate file header")
+    return _parse_header(data)[0]
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """
+    Writes data to a temporary file in the same directory and renames it over
+    path, so readers never see a partially written file.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_rates(rates: dict, fetched_at: float, effective_date: date = None,
+                path: str = BINARY_RATES_FILE) -> int:
+    """
+    Writes "<CODE>_RUB" rates to the binary file with the next version number.
+    Returns the version written.
+    """
+    try:
+        version = read_version(path) + 1
+    except (OSError, ValueError):
+        version = 1
+
+    codes = sorted(key[:-4] for key in rates if key.endswith("_RUB"))
+    count = len(codes)
+    offset = _values_offset(count)
+
+    buf = bytearray(offset + count * 8)
+    HEADER.pack_into(buf, 0, MAGIC, LAYOUT, 0, version, fetched_at,
+                     _encode_date(effective_date) if effective_date else 0, count)
+    for i, code in enumerate(codes):
+        encoded = code.encode("ascii")
+        if len(encoded) > CODE_SIZE:
+            raise ValueError(f"Currency code too long: {code}")
+        buf[HEADER.size + i * CODE_SIZE:HEADER.size + i * CODE_SIZE + len(encoded)] = encoded
+    struct.pack_into(f"<{count}d", buf, offset, *(rates[f"{code}_RUB"] for code in codes))
+
+    atomic_write(path, bytes(buf))
+    return version
+
+
+class RateFile:
+    """
+    One version of a binary rate file, read in a single read() and decoded
+    with struct. The file is closed before the constructor returns, so
+    nothing stays open or mapped between reloads.
+    """
+
+    def __init__(self, path: str = BINARY_RATES_FILE):
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < HEADER.size:
+            raise ValueError("Truncated rate file header")
+
+        self.version, self.fetched_at, effective_date, count = _parse_header(data)
+        self.effective_date = _decode_date(effective_date)
+
+        offset = _values_offset(count)
+        if len(data) < offset + count * 8:
+            raise ValueError("Truncated rate file")
+
+        self.codes = tuple(
+            data[HEADER.size + i * CODE_SIZE:HEADER.size + (i + 1) * CODE_SIZE].rstrip(b"\0").decode("ascii")
+            for i in range(count)
+        )
+        self.values = struct.unpack_from(f"<{count}d", data, offset)
+
+    def to_rates(self) -> dict:
+        """
+        Returns the rates as a "<CODE>_RUB" dictionary.
+        """
+        return {f"{code}_RUB": value for code, value in zip(self.codes, self.values)}
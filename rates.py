@@ -0,0 +1,356 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from types import MappingProxyType
+
+from ratefile import BINARY_RATES_FILE, RateFile, read_version
+
+logger = logging.getLogger(__name__)
+
+RATES_FILE = "exchange_rates.json"
+
+# CBR rates switch at midnight Moscow time (UTC+3, no DST)
+MOSCOW_TZ = timezone(timedelta(hours=3))
+
+# Offered on the reply keyboard, and the only choices while no rates are loaded
+DEFAULT_CURRENCIES = ("USD", "EUR", "AED")
+
+# Minimum transfer amount in USD for each flow that enforces one
+MIN_AMOUNTS_USD = {
+    "importer": 5000,
+    "physical": 20000,
+}
+
+
+def _ceil_cents(amount: float) -> float:
+    # The inner round() keeps float noise (5000.0000000001) from adding a cent
+    return math.ceil(round(amount * 100, 6)) / 100
+
+
+class RateSnapshot:
+    """
+    Immutable view of one day of rates (exchange_rates.json, the binary
+    rate file or the history store).
+    Besides the raw "<CODE>_RUB" rates it precomputes, once per load:
+    - usd_factors: amount in CODE * factor = amount in USD
+    - cross: (FROM, TO) -> factor for every pair of currencies
+    - minimums: flow -> CODE -> minimum transfer amount in that currency,
+      rounded up to the cent so the amount shown to the user is accepted
+    """
+    __slots__ = ("rates", "timestamp", "fetched_at", "effective_date", "effective_from", "currencies",
+                 "usd_factors", "cross", "minimums", "file_key", "generation")
+
+    def __init__(self, rates: dict, timestamp: str = None, file_key: tuple = None, fetched_at: float = None,
+                 effective_date: date = None):
+        self.rates = MappingProxyType(dict(rates))
+        self.timestamp = timestamp
+        # effective_from: unix time of Moscow midnight starting effective_date
+        self.effective_date = effective_date
+        self.effective_from = None
+        if effective_date is not None:
+            self.effective_from = datetime.combine(effective_date, datetime.min.time(), MOSCOW_TZ).timestamp()
+        self.fetched_at = fetched_at
+        if fetched_at is None:
+            try:
+                self.fetched_at = datetime.fromisoformat(timestamp).timestamp()
+            except (TypeError, ValueError):
+                pass
+        self.currencies = tuple(sorted(key[:-4] for key in rates if key.endswith("_RUB")))
+        self.file_key = file_key
+        # Bumped only when the rates differ from the previous active snapshot
+        self.generation = 0
+
+        usd_rate = rates.get("USD_RUB")
+        if usd_rate:
+            usd_factors = {code: rates[f"{code}_RUB"] / usd_rate for code in self.currencies}
+        else:
+            usd_factors = {}
+        self.usd_factors = MappingProxyType(usd_factors)
+
+        self.cross = MappingProxyType({
+            (src, dst): rates[f"{src}_RUB"] / rates[f"{dst}_RUB"]
+            for src in self.currencies
+            for dst in self.currencies
+            if rates[f"{dst}_RUB"]
+        })
+
+        self.minimums = MappingProxyType({
+            flow: MappingProxyType({
+                code: _ceil_cents(min_usd / factor) for code, factor in usd_factors.items() if factor
+            })
+            for flow, min_usd in MIN_AMOUNTS_USD.items()
+        })
+
+    def get(self, key: str) -> float:
+        return self.rates.get(key)
+
+    def age(self) -> float:
+        """
+        Seconds since these rates were fetched, or None if unknown.
+        """
+        if self.fetched_at is None:
+            return None
+        return time.time() - self.fetched_at
+
+    def to_usd(self, amount: float, currency: str) -> float:
+        """
+        Converts amount to USD. Returns None if the currency is unknown.
+        """
+        factor = self.usd_factors.get(currency)
+        return amount * factor if factor is not None else None
+
+    def convert(self, amount: float, src: str, dst: str) -> float:
+        """
+        Converts amount between two currencies. Returns None if either is unknown.
+        """
+        factor = self.cross.get((src, dst))
+        return amount * factor if factor is not None else None
+
+    def minimum(self, flow: str, currency: str) -> float:
+        """
+        Minimum transfer amount for the flow, in the given currency.
+        Returns None if the flow has no minimum or the currency is unknown.
+        """
+        return self.minimums.get(flow, {}).get(currency)
+
+
+# The active snapshot (rates effective now) and, once CBR has published
+# them, tomorrow's rates. Each is only ever replaced as a whole, so readers
+# in PTB worker threads can use them without taking a lock.
+_snapshot = None
+_pending = None
+_loaded_file_key = None
+_reload_lock = threading.Lock()
+_generation = 0
+_subscribers = []
+
+
+def subscribe(callback) -> None:
+    """
+    Registers callback(snapshot) to be called whenever a snapshot with
+    different rates becomes active, e.g. to drop rate-derived caches.
+    """
+    _subscribers.append(callback)
+
+
+def _install(snapshot: RateSnapshot) -> bool:
+    """
+    Makes snapshot the active one. Must be called with _reload_lock held.
+    Returns True if its rates differ from the previous snapshot.
+    """
+    global _snapshot, _generation
+    previous = _snapshot
+    changed = previous is None or previous.rates != snapshot.rates
+    if changed:
+        _generation += 1
+    snapshot.generation = _generation
+    _snapshot = snapshot
+    return changed
+
+
+def _notify(snapshot: RateSnapshot) -> None:
+    for callback in list(_subscribers):
+        try:
+            callback(snapshot)
+        except Exception as e:
+            logger.error(f"Rate change callback {callback!r} failed: {e}")
+
+
+def _history_snapshot(day: date) -> RateSnapshot:
+    from history import rates_as_of
+
+    try:
+        rates = rates_as_of(day)
+    except Exception as e:
+        logger.error(f"Error reading rate history: {e}")
+        return None
+    return RateSnapshot(rates, effective_date=day) if rates else None
+
+
+def _activate(snapshot: RateSnapshot) -> bool:
+    """
+    Installs a newly loaded snapshot. Rates effective in the future are held
+    as pending and switched in by get_snapshot() at Moscow midnight; until
+    then today's rates stay active (taken from the history store if this
+    process has none yet). Must be called with _reload_lock held.
+    Returns True if the active rates changed.
+    """
+    global _pending
+    now = time.time()
+    if snapshot.effective_from is None or snapshot.effective_from <= now:
+        _pending = None
+        return _install(snapshot)
+
+    _pending = snapshot
+    logger.info(f"Rates effective {snapshot.effective_date} held until Moscow midnight")
+    active = _snapshot
+    if active is not None and (active.effective_from is None or active.effective_from <= now):
+        return False
+
+    today = _history_snapshot(datetime.now(MOSCOW_TZ).date())
+    if today is not None:
+        return _install(today)
+    # Nothing effective today is known; serving tomorrow's rates beats serving none
+    _pending = None
+    return _install(snapshot)
+
+
+def _promote_pending() -> None:
+    global _pending
+    with _reload_lock:
+        pending = _pending
+        if pending is None or time.time() < pending.effective_from:
+            return
+        _pending = None
+        changed = _install(pending)
+    logger.info(f"Switched to rates effective {pending.effective_date}")
+    if changed:
+        _notify(pending)
+
+
+def _file_key(path: str) -> tuple:
+    st = os.stat(path)
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _load_snapshot(path: str, file_key: tuple) -> RateSnapshot:
+    with open(path, "r") as f:
+        data = json.load(f)
+
+    timestamp = data.pop("timestamp", None)
+    effective_date = data.pop("effective_date", None)
+    rates = {key: float(value) for key, value in data.items()}
+    return RateSnapshot(rates, timestamp, file_key,
+                        effective_date=date.fromisoformat(effective_date) if effective_date else None)
+
+
+def _load_binary_snapshot(path: str) -> RateSnapshot:
+    rate_file = RateFile(path)
+    timestamp = datetime.fromtimestamp(rate_file.fetched_at).isoformat()
+    # Key on the version actually read, in case the file was replaced after the header check
+    return RateSnapshot(rate_file.to_rates(), timestamp, ("bin", rate_file.version), rate_file.fetched_at,
+                        rate_file.effective_date)
+
+
+def _current_file_key() -> tuple:
+    """
+    Identifies the current rates on disk. Prefers the binary rate file, where
+    one header read gives the version, and falls back to stat() of the JSON.
+    """
+    try:
+        return ("bin", read_version(BINARY_RATES_FILE))
+    except (OSError, ValueError):
+        return ("json",) + _file_key(RATES_FILE)
+
+
+def get_snapshot() -> RateSnapshot:
+    """
+    Returns the snapshot effective now. Switching to tomorrow's rates at
+    Moscow midnight costs one comparison. The rates are re-read only when
+    the binary file version (or the JSON file's inode, mtime or size)
+    changed. Keeps the last good snapshot if the files are missing or
+    unreadable. Returns None if no rates were ever loaded.
+    """
+    global _loaded_file_key
+    pending = _pending
+    if pending is not None and time.time() >= pending.effective_from:
+        _promote_pending()
+    snapshot = _snapshot
+
+    try:
+        file_key = _current_file_key()
+    except OSError:
+        return snapshot
+
+    if file_key == _loaded_file_key:
+        return snapshot
+
+    with _reload_lock:
+        # Another thread may have reloaded while we were waiting
+        if file_key == _loaded_file_key:
+            return _snapshot
+        try:
+            if file_key[0] == "bin":
+                loaded = _load_binary_snapshot(BINARY_RATES_FILE)
+            else:
+                loaded = _load_snapshot(RATES_FILE, file_key)
+        except (OSError, ValueError, TypeError) as e:
+            logger.error(f"Error loading rates snapshot: {e}")
+            return _snapshot
+        _loaded_file_key = loaded.file_key
+        changed = _activate(loaded)
+        snapshot = _snapshot
+
+    if changed:
+        _notify(snapshot)
+    return snapshot
+
+
+def publish_snapshot(rates: dict, timestamp: str = None, effective_date: date = None) -> RateSnapshot:
+    """
+    Installs freshly fetched rates without waiting for the next file check.
+    Returns the snapshot that is active afterwards.
+    """
+    snapshot = RateSnapshot(rates, timestamp or datetime.now().isoformat(), effective_date=effective_date)
+    with _reload_lock:
+        changed = _activate(snapshot)
+        snapshot = _snapshot
+    if changed:
+        _notify(snapshot)
+    return snapshot
+
+
+def pending_snapshot() -> RateSnapshot:
+    """
+    Tomorrow's rates if CBR has published them, otherwise None.
+    """
+    return _pending
+
+
+def snapshot_age() -> float:
+    """
+    Age of the active snapshot in seconds, or None if no rates are loaded.
+    """
+    snapshot = _snapshot
+    return snapshot.age() if snapshot is not None else None
+
+
+def refresh_rates_job(context) -> None:
+    """
+    JobQueue callback that runs a (conditional) rate update and publishes the
+    result. Handlers keep reading the previous snapshot while the fetch runs,
+    and keep it if the fetch fails.
+    """
+    # Imported here so that handlers don't pull in the updater's logging setup
+    from exchange import FAILED, FETCHED, KEPT_PREVIOUS, update_rates
+
+    result = update_rates()
+    if result.status == FETCHED:
+        # Pick up the file update_rates just wrote; subscribers are told right away
+        snapshot = get_snapshot()
+        if _pending is None and (snapshot is None or snapshot.rates != result.rates):
+            snapshot = publish_snapshot(result.rates, effective_date=result.fetch.effective_date)
+        logger.info(f"Published {len(result.rates)} refreshed rates (generation {snapshot.generation})")
+    elif result.status in (FAILED, KEPT_PREVIOUS):
+        age = snapshot_age()
+        if age is None:
+            logger.error(f"Rate refresh {result.status} and no rates are loaded")
+        else:
+            logger.warning(f"Rate refresh {result.status}, serving rates from {age:.0f}s ago")
+
+
+def snapshot_as_of(day) -> RateSnapshot:
+    """
+    Builds a snapshot from the rate history for re-quoting an old request.
+    Returns None if the history has no rates for that date.
+    """
+    from history import rates_as_of
+
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    rates = rates_as_of(day)
+    return RateSnapshot(rates, effective_date=day) if rates else None
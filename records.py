@@ -0,0 +1,74 @@
+import sys
+
+from countries import COUNTRIES
+
+# user_data key holding the record of the flow in progress
+FLOW_KEY = "flow"
+
+
+class FlowRecord:
+    """
+    What a flow has collected so far. Amounts are numbers; currency and
+    country are interned codes shared by every record. Unset fields are None.
+    """
+    __slots__ = ("user_id", "username")
+
+    def __init__(self, **values):
+        for field in self.fields():
+            setattr(self, field, None)
+        for field, value in values.items():
+            setattr(self, field, value)
+
+    @classmethod
+    def fields(cls) -> tuple:
+        return tuple(field for base in reversed(cls.__mro__) for field in getattr(base, "__slots__", ()))
+
+    def values(self) -> tuple:
+        return tuple(getattr(self, field) for field in self.fields())
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{field}={getattr(self, field)!r}" for field in self.fields())
+        return f"{type(self).__name__}({fields})"
+
+
+class ImporterRecord(FlowRecord):
+    __slots__ = ("country", "currency", "amount", "commission_percent", "commission_message",
+                 "inn", "purpose", "phone")
+
+
+class ExporterRecord(FlowRecord):
+    # purpose is shown in the preview but not asked for (yet)
+    __slots__ = ("country", "currency", "amount", "purpose", "sender_details", "receiver_details", "phone")
+
+
+class PhysicalRecord(FlowRecord):
+    __slots__ = ("choice", "country", "currency", "amount", "phone")
+
+
+class AgentImporterRecord(ImporterRecord):
+    __slots__ = ()
+
+
+class AgentExporterRecord(ExporterRecord):
+    __slots__ = ()
+
+
+def currency_code(code: str) -> str:
+    return sys.intern(code)
+
+
+def country_code(code: str) -> str:
+    """
+    The table's own string for a known ISO code, so records share it.
+    """
+    country = COUNTRIES.get(code)
+    return country.code if country is not None else sys.intern(code)
+
+
+def format_amount(amount) -> str:
+    """
+    6000.0 -> "6000", 1234.5 -> "1234.5"; None stays None.
+    """
+    if amount is None:
+        return amount
+    return f"{amount:.2f}".rstrip("0").rstrip(".")
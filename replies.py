@@ -0,0 +1,84 @@
+from collections import namedtuple
+
+from i18n import DEFAULT_LANG, LANGUAGES, translate as _
+from keyboards import REMOVE_KEYBOARD, get_keyboard
+
+# A complete reply: text, parse mode and markup, built once at startup
+StaticReply = namedtuple("StaticReply", ["text", "parse_mode", "reply_markup"])
+
+# reply id -> (text key, parse mode, keyboard id or None to remove the keyboard)
+STATIC_REPLIES = {
+    "help": ("help_text", None, None),
+    "faq": ("faq_text", "Markdown", None),
+    "contact": ("contact_text", None, None),
+    "about": ("about_text", None, None),
+    "main_menu": ("main_menu_label", None, "main_menu"),
+}
+
+# Legacy Markdown entities: closing delimiter for each opening one
+_MARKDOWN_ENTITIES = {"*": "*", "_": "_", "`": "`", "```": "```"}
+
+
+def validate_markdown(text: str) -> None:
+    """
+    Checks that every legacy Markdown entity (*bold*, _italic_, `code`,
+    ```pre```, [text](url)) is closed, which is what Telegram rejects with
+    "Can't parse entities". Raises ValueError with the offending offset.
+    """
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            close = text.find("]", i + 1)
+            if close == -1 or not text.startswith("(", close + 1) or text.find(")", close + 2) == -1:
+                raise ValueError(f"Unclosed link at offset {i}: {text[i:i + 30]!r}")
+            i = text.find(")", close + 2) + 1
+            continue
+        opener = "```" if text.startswith("```", i) else char
+        if opener in _MARKDOWN_ENTITIES:
+            close = text.find(_MARKDOWN_ENTITIES[opener], i + len(opener))
+            if close == -1:
+                raise ValueError(f"Unclosed {opener!r} at offset {i}: {text[i:i + 30]!r}")
+            i = close + len(opener)
+            continue
+        i += 1
+
+
+def build_static_replies() -> dict:
+    """
+    Renders every static reply for every language. Raises ValueError if a
+    Markdown text would be rejected by Telegram.
+    """
+    replies = {}
+    for reply_id, (text_key, parse_mode, keyboard_id) in STATIC_REPLIES.items():
+        for lang in LANGUAGES:
+            text = _(text_key, lang)
+            if parse_mode == "Markdown":
+                try:
+                    validate_markdown(text)
+                except ValueError as e:
+                    raise ValueError(f"Invalid Markdown in {text_key} ({lang}): {e}") from None
+            markup = get_keyboard(keyboard_id, lang) if keyboard_id else REMOVE_KEYBOARD
+            replies[(reply_id, lang)] = StaticReply(text, parse_mode, markup)
+    return replies
+
+
+_replies = build_static_replies()
+
+
+def get_reply(reply_id: str, lang: str) -> StaticReply:
+    reply = _replies.get((reply_id, lang))
+    if reply is None:
+        reply = _replies[(reply_id, DEFAULT_LANG)]
+    return reply
+
+
+def send_reply(message, reply_id: str, lang: str):
+    """
+    Sends a pre-rendered static reply to message's chat.
+    """
+    reply = get_reply(reply_id, lang)
+    return message.reply_text(reply.text, parse_mode=reply.parse_mode, reply_markup=reply.reply_markup)
@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from queue import Empty, Queue
+from uuid import uuid4
+
+from telegram.ext import Dispatcher, ExtBot, JobQueue
+from telegram.utils.request import Request
+
+from rates import get_snapshot
+from webhook import WebhookUpdater
+
+logger = logging.getLogger(__name__)
+
+# Connections beyond the handler threads: getUpdates, the job queue and the
+# main thread
+EXTRA_CONNECTIONS = 4
+
+# workers: handler threads; queued: updates not yet routed to their chat;
+# pending: updates in the chat queues (including those being handled);
+# chats: chats with pending updates; longest: the longest chat queue
+RuntimeStats = namedtuple("RuntimeStats", ["workers", "queued", "pending", "chats", "longest"])
+
+
+def chat_key(update) -> object:
+    """
+    Updates with the same key are handled in arrival order: the chat, else
+    the user, else the update itself.
+    """
+    chat = getattr(update, "effective_chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        return user.id
+    return id(update)
+
+
+class ChatQueueDispatcher(Dispatcher):
+    """
+    Base of the dispatchers that keep one queue of updates per chat, so
+    updates from one chat are handled strictly one after another in arrival
+    order while different chats are handled concurrently by handler_threads
+    threads.
+
+    start() and stop() are shared; subclasses implement _run(), which
+    routes updates until stop() is called and returns only once every
+    update it routed has been handled.
+    """
+
+    def __init__(self, *args, handler_threads: int = 8, **kwargs):
+        if handler_threads < 1:
+            raise ValueError("handler_threads must be at least 1")
+        # PTB's own pool only runs run_async callbacks, which this bot has none of
+        kwargs.setdefault("workers", 1)
+        super().__init__(*args, **kwargs)
+        self.handler_threads = handler_threads
+        self._stopping = threading.Event()
+        # chat key -> updates waiting for (and including) the one in progress
+        self._chats = {}
+        self._chats_lock = threading.Lock()
+
+    def start(self, ready: threading.Event = None) -> None:
+        if self.running:
+            logger.warning("Dispatcher already running")
+            if ready is not None:
+                ready.set()
+            return
+
+        self._stopping.clear()
+        self._init_async_threads(str(uuid4()), self.workers)
+        self.running = True
+        try:
+            self._run(ready)
+        finally:
+            self.running = False
+            logger.debug("Dispatcher stopped")
+
+    def stop(self) -> None:
+        """
+        Returns once every update already taken from the update queue has
+        been handled.
+        """
+        if self.running:
+            self._stopping.set()
+            while self.running:
+                self._stopping.wait(0.1)
+        super().stop()
+
+    def _run(self, ready: threading.Event = None) -> None:
+        raise NotImplementedError
+
+    def _next_update(self):
+        """
+        Blocking read of the update queue; None after a second without one.
+        """
+        try:
+            return self.update_queue.get(True, 1)
+        except Empty:
+            return None
+
+    def _route(self, update) -> tuple:
+        """
+        Appends update to its chat's queue. Returns (key, queue) if the chat
+        had nothing pending, so the caller starts draining it; else None.
+        """
+        key = chat_key(update)
+        with self._chats_lock:
+            waiting = self._chats.get(key)
+            if waiting is not None:
+                waiting.append(update)
+                return None
+            waiting = self._chats[key] = deque((update,))
+        return key, waiting
+
+    def _done(self, key, waiting: deque) -> bool:
+        """
+        Removes the update just handled from the chat's queue. Returns True
+        (and forgets the chat) if the queue is now empty.
+        """
+        with self._chats_lock:
+            waiting.popleft()
+            if waiting:
+                return False
+            del self._chats[key]
+            return True
+
+    def _process(self, update) -> None:
+        try:
+            self.process_update(update)
+        except Exception:
+            # process_update reports handler errors itself; this keeps the
+            # chat's queue moving whatever happens
+            logger.exception(f"Failed to process update {getattr(update, 'update_id', update)}")
+        finally:
+            self.update_queue.task_done()
+
+
+class ChatOrderedDispatcher(ChatQueueDispatcher):
+    """
+    The dispatcher thread routes each update to its chat's queue; a chat
+    with pending updates holds one pool thread until its queue is empty.
+    """
+
+    def _run(self, ready: threading.Event = None) -> None:
+        pool = ThreadPoolExecutor(self.handler_threads, thread_name_prefix="handler")
+        logger.info(f"Dispatcher started with {self.handler_threads} handler threads")
+        if ready is not None:
+            ready.set()
+
+        try:
+            while not self._stopping.is_set():
+                update = self._next_update()
+                if update is None:
+                    continue
+                routed = self._route(update)
+                if routed is not None:
+                    pool.submit(self._drain, *routed)
+        finally:
+            # Finish what was already received
+            pool.shutdown(wait=True)
+
+    def _drain(self, key, waiting: deque) -> None:
+        while True:
+            self._process(waiting[0])
+            if self._done(key, waiting):
+                return
+
+
+class AsyncioDispatcher(ChatQueueDispatcher):
+    """
+    Dispatcher whose start() runs an asyncio event loop over the update
+    queue, keeping the chat queues on the loop.
+
+    The handlers stay synchronous (PTB 13's Bot API calls block), so each
+    update is processed on a pool of handler_threads threads; the loop
+    itself only routes updates and never blocks on network or file I/O.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._loop = None
+
+    def _run(self, ready: threading.Event = None) -> None:
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._serve(ready))
+        finally:
+            self._loop.close()
+            self._loop = None
+
+    async def _serve(self, ready: threading.Event = None) -> None:
+        loop = asyncio.get_running_loop()
+        handlers = ThreadPoolExecutor(self.handler_threads, thread_name_prefix="handler")
+        reader = ThreadPoolExecutor(1, thread_name_prefix="update-reader")
+        loop.set_default_executor(handlers)
+        tasks = set()
+
+        # Load the rates before the first update instead of inside it
+        await loop.run_in_executor(None, get_snapshot)
+        logger.info(f"Asyncio dispatcher started with {self.handler_threads} handler threads")
+        if ready is not None:
+            ready.set()
+
+        while not self._stopping.is_set():
+            update = await loop.run_in_executor(reader, self._next_update)
+            if update is None:
+                continue
+            routed = self._route(update)
+            if routed is not None:
+                task = loop.create_task(self._drain(*routed))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        # Finish what was already received
+        if tasks:
+            await asyncio.wait(tasks)
+        reader.shutdown()
+        handlers.shutdown()
+
+    async def _drain(self, key, waiting: deque) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await loop.run_in_executor(None, self._process, waiting[0])
+            if self._done(key, waiting):
+                return
+
+
+DISPATCHERS = {
+    "threads": ChatOrderedDispatcher,
+    "asyncio": AsyncioDispatcher,
+}
+
+
+def runtime_stats(dispatcher) -> RuntimeStats:
+    """
+    Queue depths of a ChatQueueDispatcher; PTB's own dispatcher handles one
+    update at a time and only has the update queue.
+    """
+    backlogs = [len(waiting) for waiting in tuple(getattr(dispatcher, "_chats", {}).values())]
+    return RuntimeStats(
+        workers=getattr(dispatcher, "handler_threads", 1),
+        queued=dispatcher.update_queue.qsize(),
+        pending=sum(backlogs),
+        chats=len(backlogs),
+        longest=max(backlogs, default=0)
+    )
+
+
+def connection_pool_size(handler_threads: int, configured: int = 0) -> int:
+    """
+    Every handler thread may be in a Bot API call at once, so the HTTP
+    connection pool needs one connection per thread plus EXTRA_CONNECTIONS.
+    A smaller configured size is raised to that.
+    """
+    needed = handler_threads + EXTRA_CONNECTIONS
+    if configured and configured < needed:
+        logger.warning(f"HTTP pool size {configured} is too small for {handler_threads} handler threads, "
+                       f"using {needed}")
+    return max(configured, needed)
+
+
+def build_updater(token: str, runtime: str, handler_threads: int, persistence=None,
+                  secret_token: str = None, http_pool_size: int = 0) -> WebhookUpdater:
+    """
+    "sequential" is PTB's Dispatcher, handling one update at a time;
+    "threads" and "asyncio" are the DISPATCHERS, with the connection pool
+    sized to their handler threads.
+    """
+    if runtime == "sequential":
+        return WebhookUpdater(token, use_context=True, persistence=persistence, secret_token=secret_token)
+    if runtime not in DISPATCHERS:
+        raise ValueError(f"Unknown RUNTIME {runtime!r}, expected 'sequential', 'threads' or 'asyncio'")
+
+    con_pool_size = connection_pool_size(handler_threads, http_pool_size)
+    bot = ExtBot(token, request=Request(con_pool_size=con_pool_size))
+    job_queue = JobQueue()
+    dispatcher = DISPATCHERS[runtime](bot, Queue(), job_queue=job_queue, persistence=persistence,
+                                      handler_threads=handler_threads)
+    job_queue.set_dispatcher(dispatcher)
+    return WebhookUpdater(dispatcher=dispatcher, workers=None, secret_token=secret_token)
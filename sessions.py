@@ -0,0 +1,204 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from telegram import Update
+from telegram.ext import CallbackContext
+
+from i18n import DEFAULT_LANG
+from records import FlowRecord
+
+logger = logging.getLogger(__name__)
+
+# user_data keys that outlive a flow; everything else belongs to the flow
+PERSISTENT_KEYS = ("lang",)
+
+# ttl: seconds of inactivity after which a user's flow data is dropped (the
+# language choice is kept); memory_budget: estimated bytes of user_data above
+# which the least recently seen sessions idle for at least min_idle seconds
+# are dropped from memory. A persistence keeps evicted sessions (and their
+# conversations) and reads them back on the user's next update.
+# 0 disables either limit.
+SessionLimits = namedtuple("SessionLimits", ["ttl", "memory_budget", "min_idle"])
+
+SessionStats = namedtuple("SessionStats", ["sessions", "bytes", "conversations"])
+
+# user id -> time of the user's last update, least recently seen first
+_last_seen = OrderedDict()
+_last_seen_lock = threading.Lock()
+
+# ConversationHandlers whose conversations end with an evicted session
+_conversation_handlers = []
+
+
+def touch_session(update: Update, context: CallbackContext) -> None:
+    """
+    Records the user's activity; registered for every update ahead of the
+    other handlers.
+    """
+    user = update.effective_user
+    if user is None:
+        return
+    with _last_seen_lock:
+        _last_seen[user.id] = time.monotonic()
+        _last_seen.move_to_end(user.id)
+
+
+def clear_flow_data(user_data: dict) -> None:
+    """
+    Drops everything a flow stored, keeping the user's settings.
+    """
+    for key in [key for key in user_data if key not in PERSISTENT_KEYS]:
+        del user_data[key]
+
+
+def conversation_timed_out(update: Update, context: CallbackContext) -> None:
+    clear_flow_data(context.user_data)
+    # Runs as a job, which does not save user_data by itself. The session
+    # may have been evicted from dispatcher.user_data since, so this dict is
+    # saved rather than whatever the dispatcher holds for the user now.
+    persistence = context.dispatcher.persistence
+    if persistence and update.effective_user:
+        persistence.update_user_data(update.effective_user.id, context.user_data)
+
+
+def estimate_size(obj) -> int:
+    """
+    Approximate bytes held by obj and what it contains (dicts, lists,
+    tuples, sets, flow records and scalars).
+    """
+    size = sys.getsizeof(obj)
+    # Handler threads may change a session while it is measured: iterate
+    # over a snapshot, which tuple() takes in one step
+    if isinstance(obj, dict):
+        for key, value in tuple(obj.items()):
+            size += estimate_size(key) + estimate_size(value)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in tuple(obj):
+            size += estimate_size(item)
+    elif isinstance(obj, FlowRecord):
+        for value in obj.values():
+            size += estimate_size(value)
+    return size
+
+
+def session_stats(dispatcher) -> SessionStats:
+    """
+    Number of users with stored data, their estimated size in bytes and the
+    number of conversations in progress.
+    """
+    user_data = dict(dispatcher.user_data)
+    return SessionStats(
+        sessions=len(user_data),
+        bytes=sum(estimate_size(data) for data in user_data.values()),
+        conversations=sum(len(handler.conversations) for handler in _conversation_handlers)
+    )
+
+
+def _drop_session(dispatcher, user_id: int, keep_settings: bool) -> None:
+    """
+    With keep_settings the flow data is gone for good, in memory and in the
+    persistence. Without, the session only leaves memory: the stored copy
+    stays as it is.
+    """
+    data = dispatcher.user_data.get(user_id)
+    settings = {}
+    if keep_settings and data:
+        settings = {key: data[key] for key in PERSISTENT_KEYS if key in data}
+        if settings.get("lang") == DEFAULT_LANG:
+            del settings["lang"]
+    if settings:
+        dispatcher.user_data[user_id] = settings
+    else:
+        dispatcher.user_data.pop(user_id, None)
+
+    # Private chats share the user's id; the bot keeps nothing in chat_data
+    if not dispatcher.chat_data.get(user_id):
+        dispatcher.chat_data.pop(user_id, None)
+
+    if keep_settings and dispatcher.persistence:
+        dispatcher.persistence.update_user_data(user_id, dispatcher.user_data.get(user_id, {}))
+        dispatcher.persistence.update_chat_data(user_id, dispatcher.chat_data.get(user_id, {}))
+
+
+def _end_conversations(user_ids: set) -> None:
+    """
+    Ends the conversations of dropped sessions; their flow data is gone.
+    Conversation keys end with the user id (per_user).
+    """
+    for handler in _conversation_handlers:
+        for key in [key for key in handler.conversations if key[-1] in user_ids]:
+            handler.conversations.pop(key, None)
+            if handler.persistent:
+                handler.persistence.update_conversation(handler.name, key, None)
+
+
+def sweep_sessions(context: CallbackContext) -> None:
+    """
+    Repeating job: drops the flow data of sessions idle for longer than the
+    TTL and ends their conversations, then evicts least recently seen idle
+    sessions from memory until the estimated size of all user_data is
+    within the memory budget (ending their conversations too when there is
+    no persistence to restore them from).
+    """
+    limits = context.job.context
+    dispatcher = context.dispatcher
+    now = time.monotonic()
+
+    expired = []
+    with _last_seen_lock:
+        if limits.ttl:
+            for user_id, seen in _last_seen.items():
+                if now - seen < limits.ttl:
+                    break
+                expired.append(user_id)
+            for user_id in expired:
+                del _last_seen[user_id]
+    for user_id in expired:
+        _drop_session(dispatcher, user_id, keep_settings=True)
+
+    evicted = []
+    stats = session_stats(dispatcher)
+    if limits.memory_budget and stats.bytes > limits.memory_budget:
+        with _last_seen_lock:
+            seen_order = list(_last_seen.items())
+        # Users without a recorded update (e.g. only a kept language) go first
+        recent = dict(seen_order)
+        candidates = [user_id for user_id in list(dispatcher.user_data) if user_id not in recent]
+        candidates += [user_id for user_id, seen in seen_order if now - seen >= limits.min_idle]
+
+        excess = stats.bytes - limits.memory_budget
+        for user_id in candidates:
+            if excess <= 0:
+                break
+            excess -= estimate_size(dispatcher.user_data.get(user_id, {}))
+            _drop_session(dispatcher, user_id, keep_settings=False)
+            with _last_seen_lock:
+                _last_seen.pop(user_id, None)
+            evicted.append(user_id)
+
+    if expired or evicted:
+        ended = set(expired)
+        if not dispatcher.persistence:
+            # Nothing brings evicted sessions back
+            ended.update(evicted)
+        _end_conversations(ended)
+        stats = session_stats(dispatcher)
+        logger.info(f"Expired {len(expired)} idle sessions, evicted {len(evicted)} over the memory budget")
+    logger.info(f"Sessions: {stats.sessions} users, ~{stats.bytes // 1024} KiB, "
+                f"{stats.conversations} conversations in progress")
+
+
+def start_session_sweeper(dispatcher, conversations, limits: SessionLimits, interval: float) -> None:
+    """
+    Sessions restored from persistence count as seen now, so the TTL
+    applies to them from this start on.
+    """
+    _conversation_handlers[:] = conversations
+    now = time.monotonic()
+    with _last_seen_lock:
+        for user_id in list(dispatcher.user_data):
+            _last_seen.setdefault(user_id, now)
+    dispatcher.job_queue.run_repeating(sweep_sessions, interval=interval, first=interval, context=limits)
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+from telegram import Bot, User
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+class OfflineBot(Bot):
+    """
+    A bot that knows itself without calling getMe, for dispatchers started
+    in tests.
+    """
+
+    def get_me(self, *args, **kwargs) -> User:
+        return User(1, "bot", True, username="bot")
+
+
+@pytest.fixture(scope="session")
+def exchange():
+    import exchange
+    return exchange
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """
+    Runs the test in an empty directory, where the rate files and the
+    history store are created.
+    """
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
@@ -0,0 +1,103 @@
+import os
+import threading
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from conftest import FIXTURES
+from history import rates_as_of, stored_dates
+
+# What XML_daily.asp answers for each requested date: the rates CBR set
+# on or before it. Friday's rates hold through Monday.
+RESPONSES = {
+    "01/03/2024": "XML_daily_2024-03-01.xml",
+    "02/03/2024": "XML_daily_2024-03-02.xml",
+    "03/03/2024": "XML_daily_2024-03-02.xml",
+    "04/03/2024": "XML_daily_2024-03-02.xml",
+    "05/03/2024": "XML_daily_2024-03-05.xml",
+}
+TODAY = "05/03/2024"
+
+
+class CbrStandIn(BaseHTTPRequestHandler):
+    """
+    Serves the XML_daily.asp fixtures; without date_req, today's.
+    """
+    requested = []
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        day = query.get("date_req", [TODAY])[0]
+        self.requested.append(day)
+        if day not in RESPONSES:
+            self.send_error(404)
+            return
+        with open(os.path.join(FIXTURES, RESPONSES[day]), "rb") as f:
+            content = f.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml; charset=windows-1251")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def cbr_url():
+    CbrStandIn.requested = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CbrStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}/scripts/XML_daily.asp"
+    server.shutdown()
+    server.server_close()
+
+
+def test_backfill_stores_rates_under_the_valcurs_date(exchange, workdir, cbr_url):
+    stored, failed = exchange.backfill(date(2024, 3, 1), date(2024, 3, 5), workers=2, url=cbr_url)
+
+    assert (stored, failed) == (3, 0)
+    assert stored_dates(date(2024, 3, 1), date(2024, 3, 5)) == {"2024-03-01", "2024-03-02", "2024-03-05"}
+    assert rates_as_of(date(2024, 3, 2))["USD_RUB"] == pytest.approx(91.3336)
+    # The weekend and Monday resolve to the rates CBR set on Saturday
+    assert rates_as_of(date(2024, 3, 4)) == rates_as_of(date(2024, 3, 2))
+    assert rates_as_of(date(2024, 3, 5))["JPY_RUB"] == pytest.approx(0.608418)
+
+
+def test_backfill_skips_stored_dates(exchange, workdir, cbr_url):
+    exchange.backfill(date(2024, 3, 1), date(2024, 3, 2), url=cbr_url)
+    CbrStandIn.requested = []
+
+    stored, failed = exchange.backfill(date(2024, 3, 1), date(2024, 3, 5), url=cbr_url)
+
+    assert (stored, failed) == (1, 0)
+    assert sorted(CbrStandIn.requested) == ["03/03/2024", "04/03/2024", "05/03/2024"]
+
+
+def test_backfill_does_not_refetch_days_without_own_rates(exchange, workdir, cbr_url):
+    exchange.backfill(date(2024, 3, 1), date(2024, 3, 5), url=cbr_url)
+    CbrStandIn.requested = []
+
+    stored, failed = exchange.backfill(date(2024, 3, 1), date(2024, 3, 5), url=cbr_url)
+
+    assert (stored, failed) == (0, 0)
+    assert CbrStandIn.requested == []
+
+
+def test_update_rates_and_backfill_agree_on_the_date(exchange, workdir, cbr_url):
+    result = exchange.update_rates(providers=[exchange.CbrXmlProvider(url=cbr_url)])
+
+    assert result.status == exchange.FETCHED
+    assert stored_dates(date(2024, 3, 1), date(2024, 3, 5)) == {"2024-03-05"}
+
+    # Today is already stored under the same date, so backfill leaves it alone
+    CbrStandIn.requested = []
+    stored, failed = exchange.backfill(date(2024, 3, 4), date(2024, 3, 5), url=cbr_url)
+    assert (stored, failed) == (1, 0)
+    assert CbrStandIn.requested == ["04/03/2024"]
+    assert stored_dates(date(2024, 3, 1), date(2024, 3, 5)) == {"2024-03-02", "2024-03-05"}
+    assert rates_as_of(date(2024, 3, 5)) == result.rates
@@ -0,0 +1,64 @@
+from queue import Queue
+
+from telegram import Update
+from telegram.ext import Dispatcher
+
+from conftest import OfflineBot
+from main import add_handlers
+from records import FLOW_KEY, ImporterRecord
+
+
+class RecordingBot(OfflineBot):
+    """
+    Records the calls the handlers make instead of sending them.
+    """
+
+    def __init__(self, token: str):
+        super().__init__(token)
+        self.calls = []
+
+    def answer_callback_query(self, callback_query_id, *args, **kwargs):
+        self.calls.append(("answer", callback_query_id))
+        return True
+
+    def edit_message_text(self, text, *args, **kwargs):
+        self.calls.append(("edit", text))
+        return True
+
+    def send_message(self, chat_id, text, *args, **kwargs):
+        self.calls.append(("send", text))
+
+
+def button_press(update_id: int, user_id: int, data: str, bot) -> Update:
+    sender = {"id": user_id, "is_bot": False, "first_name": "U"}
+    return Update.de_json({"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": sender, "chat_instance": "1", "data": data,
+        "message": {"message_id": 1, "date": 0, "text": "...", "chat": {"id": user_id, "type": "private"}}}}, bot)
+
+
+def make_dispatcher():
+    bot = RecordingBot("123:abc")
+    dispatcher = Dispatcher(bot, Queue(), use_context=True)
+    return bot, dispatcher, add_handlers(dispatcher)
+
+
+def test_stale_buttons_are_answered(workdir):
+    bot, dispatcher, _ = make_dispatcher()
+
+    # No conversation: a button from an old message, or pressed after /cancel
+    dispatcher.process_update(button_press(1, 7, "cur:USD", bot))
+    dispatcher.process_update(button_press(2, 7, "country:Germany", bot))
+
+    assert bot.calls == [("answer", "1"), ("answer", "2")]
+
+
+def test_currency_button_enters_the_amount_step_and_is_answered_once(workdir):
+    bot, dispatcher, conversations = make_dispatcher()
+    dispatcher.user_data[7][FLOW_KEY] = ImporterRecord(country="DE")
+    conversations.conversations[(7, 7)] = "importer.currency"
+
+    dispatcher.process_update(button_press(1, 7, "cur:USD", bot))
+
+    assert [call for call in bot.calls if call[0] == "answer"] == [("answer", "1")]
+    assert bot.calls[-1][0] == "send"
+    assert conversations.conversations[(7, 7)] == "importer.amount"
@@ -0,0 +1,108 @@
+import threading
+import time
+from queue import Queue
+from types import SimpleNamespace
+
+from telegram import Update
+from telegram.ext import JobQueue, TypeHandler
+
+import sessions
+from conftest import OfflineBot
+from persistence import SQLitePersistence
+from runtime import ChatOrderedDispatcher
+from webhook import WebhookUpdater
+
+
+def message(update_id: int, user_id: int, bot) -> Update:
+    sender = {"id": user_id, "is_bot": False, "first_name": "U"}
+    return Update.de_json({"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": "hi", "chat": {"id": user_id, "type": "private"},
+        "from": sender}}, bot)
+
+
+def test_updates_handled_while_stopping_are_flushed(workdir):
+    bot = OfflineBot("123:abc")
+    persistence = SQLitePersistence("sessions.db")
+    job_queue = JobQueue()
+    dispatcher = ChatOrderedDispatcher(bot, Queue(), job_queue=job_queue, persistence=persistence,
+                                       handler_threads=2)
+    job_queue.set_dispatcher(dispatcher)
+    updater = WebhookUpdater(dispatcher=dispatcher, workers=None)
+
+    def count(update, context):
+        time.sleep(0.02)
+        context.user_data["n"] = context.user_data.get("n", 0) + 1
+
+    dispatcher.add_handler(TypeHandler(Update, count))
+    ready = threading.Event()
+    thread = threading.Thread(target=dispatcher.start, kwargs={"ready": ready})
+    thread.start()
+    assert ready.wait(5)
+    for update_id in range(5):
+        dispatcher.update_queue.put(message(update_id, 7, bot))
+    while dispatcher.update_queue.qsize():
+        time.sleep(0.01)
+
+    # What PTB's signal handler does: flush, then stop
+    dispatcher.update_persistence()
+    persistence.flush()
+    updater.stop()
+    thread.join(5)
+
+    assert dispatcher.user_data[7] == {"n": 5}
+    assert SQLitePersistence("sessions.db").get_user_data()[7] == {"n": 5}
+
+
+def sweep(dispatcher, conversations, limits):
+    sessions._conversation_handlers[:] = [conversations]
+    context = SimpleNamespace(job=SimpleNamespace(context=limits), dispatcher=dispatcher)
+    sessions.sweep_sessions(context)
+
+
+def stored_dispatcher(persistence, user_data: dict):
+    dispatcher = SimpleNamespace(user_data=persistence.get_user_data(), chat_data=persistence.get_chat_data(),
+                                 persistence=persistence)
+    conversations = SimpleNamespace(conversations={}, persistent=True, persistence=persistence, name="main")
+    for user_id, data in user_data.items():
+        dispatcher.user_data[user_id] = data
+        persistence.update_user_data(user_id, data)
+        conversations.conversations[(user_id, user_id)] = "importer.amount"
+        persistence.update_conversation("main", (user_id, user_id), "importer.amount")
+    persistence.flush()
+    return dispatcher, conversations
+
+
+def test_eviction_only_frees_memory(workdir, monkeypatch):
+    monkeypatch.setattr(sessions, "_last_seen", sessions.OrderedDict())
+    persistence = SQLitePersistence("sessions.db")
+    session = {"lang": "en", "flow": ["importer", "DE", "EUR"]}
+    dispatcher, conversations = stored_dispatcher(persistence, {7: dict(session)})
+
+    sweep(dispatcher, conversations, sessions.SessionLimits(ttl=0, memory_budget=1, min_idle=0))
+    persistence.flush()
+
+    assert 7 not in dispatcher.user_data
+    assert conversations.conversations == {(7, 7): "importer.amount"}
+    restarted = SQLitePersistence("sessions.db")
+    assert restarted.get_user_data()[7] == session
+    assert restarted.get_conversations("main") == {(7, 7): "importer.amount"}
+
+    # The user's next update reads the session back
+    user_data = dispatcher.user_data[7]
+    persistence.refresh_user_data(7, user_data)
+    assert user_data == session
+
+
+def test_ttl_expiry_keeps_only_settings(workdir, monkeypatch):
+    monkeypatch.setattr(sessions, "_last_seen", sessions.OrderedDict({7: 0}))
+    persistence = SQLitePersistence("sessions.db")
+    dispatcher, conversations = stored_dispatcher(persistence, {7: {"lang": "en", "flow": ["importer"]}})
+
+    sweep(dispatcher, conversations, sessions.SessionLimits(ttl=1, memory_budget=0, min_idle=0))
+    persistence.flush()
+
+    assert dispatcher.user_data[7] == {"lang": "en"}
+    assert conversations.conversations == {}
+    restarted = SQLitePersistence("sessions.db")
+    assert restarted.get_user_data()[7] == {"lang": "en"}
+    assert restarted.get_conversations("main") == {}
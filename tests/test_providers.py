@@ -0,0 +1,176 @@
+import time
+
+import pytest
+import requests
+
+
+@pytest.fixture
+def fake_provider(exchange):
+    class FakeProvider(exchange.RateProvider):
+        """
+        Answers after delay seconds with the given rates, or fails with
+        error (a string for a FAILED result, an exception to raise).
+        """
+
+        def __init__(self, name: str, rates: dict = None, delay: float = 0, error=None, deadline: float = 1):
+            super().__init__(deadline)
+            self.name = name
+            self.rates = rates
+            self.delay = delay
+            self.error = error
+
+        def fetch(self, validators: dict = None):
+            time.sleep(self.delay)
+            if isinstance(self.error, Exception):
+                raise self.error
+            if self.error:
+                return exchange.FetchResult(exchange.FAILED, None, None, 1, self.error, source=self.name)
+            return exchange.FetchResult(exchange.FETCHED, self.rates, None, 1, None, source=self.name)
+
+    return FakeProvider
+
+
+class FakeSession:
+    """
+    Fails the first failures requests with a connection error, then
+    answers with the XML document; records each request's timeout.
+    """
+
+    def __init__(self, content: bytes, failures: int = 0):
+        self.content = content
+        self.failures = failures
+        self.timeouts = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.timeouts.append(timeout)
+        if len(self.timeouts) <= self.failures:
+            raise requests.ConnectionError("connection refused")
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.content
+        return response
+
+
+CBR_XML = (
+    b'<?xml version="1.0" encoding="windows-1251"?><ValCurs Date="05.03.2024" name="Foreign Currency Market">'
+    b'<Valute ID="R01235"><NumCode>840</NumCode><CharCode>USD</CharCode><Nominal>1</Nominal>'
+    b'<Name>USD</Name><Value>91,3591</Value></Valute></ValCurs>'
+)
+
+
+def test_priority_prefers_the_first_provider_that_answers(exchange, fake_provider):
+    slow = fake_provider("slow", {"USD_RUB": 90.0}, delay=0.2)
+    fast = fake_provider("fast", {"USD_RUB": 91.0})
+
+    result = exchange.fetch_rates([slow, fast], "priority")
+
+    assert result.source == "slow"
+    assert result.rates == {"USD_RUB": 90.0}
+
+
+def test_priority_falls_back_when_a_provider_fails(exchange, fake_provider):
+    providers = [
+        fake_provider("failing", error="HTTP 503"),
+        fake_provider("raising", error=ValueError("bad document")),
+        fake_provider("fallback", {"USD_RUB": 91.0}, delay=0.05),
+    ]
+
+    result = exchange.fetch_rates(providers, "priority")
+
+    assert result.status == exchange.FETCHED
+    assert result.source == "fallback"
+
+
+def test_priority_abandons_a_provider_past_its_deadline(exchange, fake_provider):
+    stuck = fake_provider("stuck", {"USD_RUB": 90.0}, delay=2, deadline=0.2)
+    fallback = fake_provider("fallback", {"USD_RUB": 91.0})
+
+    started = time.monotonic()
+    result = exchange.fetch_rates([stuck, fallback], "priority")
+
+    assert result.source == "fallback"
+    assert time.monotonic() - started < 1
+
+
+def test_first_takes_the_fastest_successful_answer(exchange, fake_provider):
+    providers = [
+        fake_provider("slow", {"USD_RUB": 90.0}, delay=0.3),
+        fake_provider("failing", error="HTTP 500"),
+        fake_provider("fast", {"USD_RUB": 91.0}, delay=0.05),
+    ]
+
+    result = exchange.fetch_rates(providers, "first")
+
+    assert result.source == "fast"
+
+
+def test_median_drops_deviating_values(exchange, fake_provider):
+    providers = [
+        fake_provider("a", {"USD_RUB": 90.0, "EUR_RUB": 99.0}),
+        fake_provider("b", {"USD_RUB": 90.4, "EUR_RUB": 99.2}),
+        fake_provider("c", {"USD_RUB": 90.2, "EUR_RUB": 150.0}),
+    ]
+
+    result = exchange.fetch_rates(providers, "median", quorum=2, max_deviation=0.02)
+
+    assert result.status == exchange.FETCHED
+    assert result.rates["USD_RUB"] == pytest.approx(90.2)
+    assert result.rates["EUR_RUB"] == pytest.approx(99.1)
+    assert result.source == "median(a,b,c)"
+
+
+def test_median_needs_a_quorum(exchange, fake_provider):
+    providers = [
+        fake_provider("a", {"USD_RUB": 90.0}),
+        fake_provider("failing", error="HTTP 502"),
+        fake_provider("stuck", {"USD_RUB": 90.1}, delay=2, deadline=0.2),
+    ]
+
+    result = exchange.fetch_rates(providers, "median", quorum=2)
+
+    assert result.status == exchange.FAILED
+    assert "Only 1 of 2" in result.error
+
+
+def test_median_fails_when_providers_disagree_on_usd(exchange, fake_provider):
+    providers = [fake_provider("a", {"USD_RUB": 90.0}), fake_provider("b", {"USD_RUB": 120.0})]
+
+    result = exchange.fetch_rates(providers, "median", quorum=2, max_deviation=0.02)
+
+    assert result.status == exchange.FAILED
+
+
+def test_all_providers_failing_reports_each_error(exchange, fake_provider):
+    providers = [
+        fake_provider("failing", error="HTTP 503"),
+        fake_provider("stuck", {"USD_RUB": 90.0}, delay=2, deadline=0.2),
+    ]
+
+    result = exchange.fetch_rates(providers, "priority")
+
+    assert result.status == exchange.FAILED
+    assert result.error == "failing: HTTP 503; stuck: timed out"
+
+
+def test_cbr_xml_provider_retries_within_its_deadline(exchange, monkeypatch):
+    session = FakeSession(CBR_XML, failures=2)
+    monkeypatch.setattr(exchange, "get_session", lambda: session)
+    monkeypatch.setattr(exchange, "FETCH_BACKOFF", 0.01)
+
+    result = exchange.CbrXmlProvider(url="http://cbr.invalid/").fetch()
+
+    assert result.status == exchange.FETCHED
+    assert result.attempts == 3
+    assert result.rates == {"USD_RUB": pytest.approx(91.3591)}
+
+
+def test_fetch_cbr_cuts_timeouts_and_retries_to_the_deadline(exchange, monkeypatch):
+    session = FakeSession(CBR_XML, failures=10)
+    monkeypatch.setattr(exchange, "FETCH_BACKOFF", 0.2)
+
+    result = exchange.fetch_cbr(session=session, url="http://cbr.invalid/", retries=10, deadline=0.5)
+
+    assert result.status == exchange.FAILED
+    # Attempt 1 at once, attempt 2 after ~0.2 s; the ~0.4 s backoff to attempt 3 would pass the deadline
+    assert 1 <= result.attempts < 4
+    assert all(read <= 0.5 for _, read in session.timeouts)
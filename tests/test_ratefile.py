@@ -0,0 +1,31 @@
+import os
+from datetime import date
+
+import pytest
+
+from ratefile import RateFile, read_version, write_rates
+
+
+def open_files() -> set:
+    return {os.readlink(f"/proc/self/fd/{fd}") for fd in os.listdir("/proc/self/fd")
+            if os.path.exists(f"/proc/self/fd/{fd}")}
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_reloading_reads_each_version_and_keeps_nothing_open(workdir):
+    path = str(workdir / "exchange_rates.bin")
+    write_rates({"USD_RUB": 91.5, "EUR_RUB": 99.25}, 1700000000.0, date(2024, 3, 1), path)
+    first = RateFile(path)
+    write_rates({"USD_RUB": 92.0, "EUR_RUB": 99.5, "AED_RUB": 25.0}, 1700086400.0, date(2024, 3, 2), path)
+    second = RateFile(path)
+
+    assert (first.version, second.version) == (1, 2)
+    assert read_version(path) == 2
+    assert first.to_rates() == {"EUR_RUB": 99.25, "USD_RUB": 91.5}
+    assert first.effective_date == date(2024, 3, 1)
+    assert second.to_rates() == {"AED_RUB": 25.0, "EUR_RUB": 99.5, "USD_RUB": 92.0}
+    assert second.fetched_at == 1700086400.0
+    # Neither load left the file (or the one it replaced) open or mapped
+    assert not any(name.startswith(str(workdir)) for name in open_files())
+    with open("/proc/self/maps") as maps:
+        assert str(workdir) not in maps.read()
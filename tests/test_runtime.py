@@ -0,0 +1,45 @@
+import threading
+import time
+from queue import Queue
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import OfflineBot
+from runtime import DISPATCHERS, chat_key
+
+
+def make_update(update_id: int, chat_id: int) -> SimpleNamespace:
+    return SimpleNamespace(update_id=update_id, effective_chat=SimpleNamespace(id=chat_id))
+
+
+@pytest.mark.parametrize("runtime", sorted(DISPATCHERS))
+def test_stop_handles_every_routed_update_in_chat_order(runtime, workdir):
+    dispatcher = DISPATCHERS[runtime](OfflineBot("123:abc"), Queue(), handler_threads=2)
+    handled = []
+
+    def process_update(update):
+        time.sleep(0.01)
+        handled.append(update)
+
+    dispatcher.process_update = process_update
+    updates = [make_update(i, i % 3) for i in range(30)]
+    ready = threading.Event()
+    thread = threading.Thread(target=dispatcher.start, kwargs={"ready": ready})
+    thread.start()
+    assert ready.wait(5)
+
+    for update in updates:
+        dispatcher.update_queue.put(update)
+    while dispatcher.update_queue.qsize():
+        time.sleep(0.01)
+    # Most updates are still waiting in their chat queues here
+    dispatcher.stop()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert not dispatcher.running
+    assert len(handled) == len(updates)
+    for chat in range(3):
+        assert [u for u in handled if chat_key(u) == chat] == [u for u in updates if chat_key(u) == chat]
+    assert dispatcher._chats == {}
@@ -0,0 +1,21 @@
+from textindex import TextIndex
+
+INDEX = TextIndex({
+    "DE": ("DE", "Germany", "Германия"),
+    "GE": ("GE", "Georgia", "Грузия"),
+    "BYN": ("BYN", "Belarusian ruble", "белорусский рубль"),
+})
+
+
+def test_lookup_only_matches_whole_names():
+    assert INDEX.lookup("  германия ") == ("DE",)
+    assert INDEX.lookup("Герма") == ()
+    assert INDEX.lookup("Germny") == ()
+
+
+def test_search_falls_back_to_prefixes_and_typos():
+    assert INDEX.search("Германия") == ("DE",)
+    assert INDEX.search("Герма") == ("DE",)
+    assert INDEX.search("Germny")[0] == "DE"
+    assert INDEX.search("belarusian") == ("BYN",)
+    assert INDEX.search("xyz") == ()
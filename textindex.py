@@ -0,0 +1,149 @@
+from bisect import bisect_left
+from collections import defaultdict
+
+SEARCH_LIMIT = 6
+MIN_PREFIX = 2
+# Dice coefficient over trigrams below which a typo match is ignored
+MIN_SIMILARITY = 0.4
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.lower().replace("ё", "е").split())
+
+
+def _trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TextIndex:
+    """
+    Lookup from free text to keys (currency or country codes): exact terms
+    in a dict, prefixes by bisecting the sorted terms, typos through a
+    trigram index.
+    """
+    __slots__ = ("exact", "terms", "trigrams", "sizes")
+
+    def __init__(self, names: dict):
+        """
+        names: key -> iterable of names and aliases for that key.
+        """
+        exact = defaultdict(list)
+        for key, aliases in names.items():
+            for alias in aliases:
+                term = normalize(alias)
+                if term and key not in exact[term]:
+                    exact[term].append(key)
+        self.exact = {term: tuple(keys) for term, keys in exact.items()}
+        self.terms = sorted(self.exact)
+
+        trigrams = defaultdict(list)
+        sizes = []
+        for i, term in enumerate(self.terms):
+            grams = _trigrams(term)
+            sizes.append(len(grams))
+            for gram in grams:
+                trigrams[gram].append(i)
+        self.trigrams = dict(trigrams)
+        self.sizes = sizes
+
+    def lookup(self, text: str) -> tuple:
+        """
+        Returns the keys with a name or alias equal to text (normalized).
+        """
+        return self.exact.get(normalize(text), ())
+
+    def search(self, text: str, limit: int = SEARCH_LIMIT) -> tuple:
+        """
+        Returns up to limit matching keys, best first; an exact name wins
+        over prefixes, which win over typo matches.
+        """
+        term = normalize(text)
+        if not term:
+            return ()
+
+        keys = self.exact.get(term)
+        if keys:
+            return keys[:limit]
+
+        found = []
+        if len(term) >= MIN_PREFIX:
+            i = bisect_left(self.terms, term)
+            while i < len(self.terms) and self.terms[i].startswith(term) and len(found) < limit:
+                for key in self.exact[self.terms[i]]:
+                    if key not in found:
+                        found.append(key)
+                i += 1
+            if found:
+                return tuple(found[:limit])
+
+        grams = _trigrams(term)
+        shared = defaultdict(int)
+        for gram in grams:
+            for i in self.trigrams.get(gram, ()):
+                shared[i] += 1
+        scored = sorted(
+            ((2 * count / (len(grams) + self.sizes[i]), self.terms[i]) for i, count in shared.items()),
+            reverse=True
+        )
+        for score, matched in scored:
+            if score < MIN_SIMILARITY or len(found) >= limit:
+                break
+            for key in self.exact[matched]:
+                if key not in found:
+                    found.append(key)
+        return tuple(found[:limit])
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton: finds every occurrence of a set of keywords in a
+    single pass over the text, however many keywords there are.
+    """
+    __slots__ = ("goto", "fail", "output")
+
+    def __init__(self, keywords: dict):
+        """
+        keywords: keyword -> value reported when it is found.
+        """
+        goto = [{}]
+        output = [[]]
+        for keyword, value in keywords.items():
+            node = 0
+            for char in keyword:
+                if char not in goto[node]:
+                    goto.append({})
+                    output.append([])
+                    goto[node][char] = len(goto) - 1
+                node = goto[node][char]
+            output[node].append((len(keyword), value))
+
+        # Breadth-first from the root's children (whose failure link is the
+        # root), so a node's failure link is final before its children's
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for node in queue:
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                output[child] = output[child] + output[fail[child]]
+
+        self.goto = goto
+        self.fail = fail
+        self.output = output
+
+    def find(self, text: str):
+        """
+        Yields (start, end, value) for every keyword occurrence in text.
+        """
+        goto, fail, output = self.goto, self.fail, self.output
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, value in output[node]:
+                yield end - length, end, value
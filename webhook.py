@@ -0,0 +1,153 @@
+"""
+Webhook serving for the bot, and a client that POSTs recorded updates to
+a running listener for local testing:
+
+    python webhook.py http://127.0.0.1:8443/bot updates.json --secret TOKEN
+
+updates.json holds one Update object or a list of them, as Telegram sends
+them (getUpdates results work as they are).
+"""
+import argparse
+import hmac
+import json
+import logging
+import ssl
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import tornado.web
+from telegram.ext import Updater
+from telegram.ext.utils.webhookhandler import WebhookHandler, WebhookServer
+
+logger = logging.getLogger(__name__)
+
+# The update types the handlers react to; Telegram does not send the others
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class SecretWebhookHandler(WebhookHandler):
+    """
+    PTB 13's webhook handler, also rejecting requests that do not carry
+    the secret token given to setWebhook.
+    """
+
+    def initialize(self, bot, update_queue, secret_token: str = None) -> None:
+        super().initialize(bot, update_queue)
+        self.secret_token = secret_token
+
+    def _validate_post(self) -> None:
+        super()._validate_post()
+        if self.secret_token:
+            received = self.request.headers.get(SECRET_HEADER, "")
+            if not hmac.compare_digest(received.encode(), self.secret_token.encode()):
+                logger.warning(f"Rejected webhook request from {self.request.remote_ip}: bad secret token")
+                raise tornado.web.HTTPError(403)
+
+
+class WebhookApp(tornado.web.Application):
+    def __init__(self, webhook_path: str, bot, update_queue, secret_token: str = None):
+        shared = {"bot": bot, "update_queue": update_queue, "secret_token": secret_token}
+        super().__init__([(rf"{webhook_path}/?", SecretWebhookHandler, shared)])
+
+    def log_request(self, handler: tornado.web.RequestHandler) -> None:
+        pass
+
+
+class WebhookUpdater(Updater):
+    """
+    Updater whose start_webhook serves SecretWebhookHandler. Registering
+    the webhook with Telegram is left to register_webhook, so a listener
+    can also run locally without one. stop() flushes the persistence once
+    the dispatcher is done.
+    """
+
+    def __init__(self, *args, secret_token: str = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.secret_token = secret_token
+
+    def stop(self) -> None:
+        # PTB flushes the persistence before stopping the dispatcher, which
+        # then still handles the updates it had queued
+        super().stop()
+        if self.persistence:
+            self.persistence.flush()
+
+    def _start_webhook(self, listen, port, url_path, cert, key, bootstrap_retries, drop_pending_updates,
+                       webhook_url, allowed_updates, ready=None, ip_address=None, max_connections=40):
+        self.logger.debug("Updater thread started (webhook)")
+        if not url_path.startswith("/"):
+            url_path = f"/{url_path}"
+
+        ssl_ctx = None
+        if cert is not None and key is not None:
+            ssl_ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ssl_ctx.load_cert_chain(cert, key)
+
+        app = WebhookApp(url_path, self.bot, self.update_queue, self.secret_token)
+        self.httpd = WebhookServer(listen, port, app, ssl_ctx)
+        self.httpd.serve_forever(ready=ready)
+
+
+def register_webhook(bot, url: str, secret_token: str = None, max_connections: int = 40,
+                     drop_pending_updates: bool = False) -> None:
+    bot.set_webhook(
+        url=url,
+        allowed_updates=ALLOWED_UPDATES,
+        max_connections=max_connections,
+        secret_token=secret_token or None,
+        drop_pending_updates=drop_pending_updates,
+    )
+    logger.info(f"Webhook set to {url} (max {max_connections} connections)")
+
+
+def post_updates(url: str, updates: list, secret_token: str = None, timeout: float = 10) -> list:
+    """
+    POSTs each update as Telegram would; returns the HTTP status codes.
+    """
+    headers = {"Content-Type": "application/json"}
+    if secret_token:
+        headers[SECRET_HEADER] = secret_token
+
+    statuses = []
+    for update in updates:
+        request = urllib.request.Request(url, data=json.dumps(update).encode(), headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                statuses.append(response.status)
+        except urllib.error.HTTPError as e:
+            statuses.append(e.code)
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="POST recorded updates to a webhook listener")
+    parser.add_argument("url", help="Listener URL, e.g. http://127.0.0.1:8443/bot")
+    parser.add_argument("files", nargs="+", help="JSON files with an Update or a list of them")
+    parser.add_argument("--secret", help="Secret token the listener expects")
+    parser.add_argument("--delay", type=float, default=0, help="Seconds between updates")
+    args = parser.parse_args()
+
+    updates = []
+    for path in args.files:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get("result", [data])
+        updates.extend(data)
+
+    failed = 0
+    for update in updates:
+        status, = post_updates(args.url, [update], args.secret)
+        print(f"update {update.get('update_id')}: HTTP {status}")
+        failed += status != 200
+        if args.delay:
+            time.sleep(args.delay)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()